@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+配置和树苗消息编码的微基准测试。
+
+对比原始字典消息与util.codec编码后的消息的大小和编解码耗时。
+引擎的网络序列化格式不对外公开，大小用json序列化后的字节数近似。
+
+用法（在仓库根目录）：
+    python benchmarks/bench_codec.py
+"""
+from __future__ import print_function
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "saplanting_behavior_pack"))
+
+from SaplantingScripts.config.sapling import default_saplings  # noqa: E402
+from SaplantingScripts.util.codec import encode_message, decode_message, encode_landings, decode_landings  # noqa: E402
+
+
+def build_master_setting():
+    """完整的主配置同步消息：默认白名单加上若干模组物品"""
+    saplings = [list(value) for value in default_saplings]
+    saplings += [["othermod:sapling_{}".format(i), i % 4] for i in range(10)]
+    return {
+        "min_wait_time": 3,
+        "server_side_detection": True,
+        "max_ground_checks": 8,
+        "saplings": saplings,
+        "saplings_revision": 12,
+        "hash": "a302447633bbea5d1f842d1e5e24b421",
+    }
+
+
+def build_delta():
+    """白名单增量消息"""
+    return {"revision": 13, "add": [["minecraft:cherry_sapling", 0]]}
+
+
+def build_landings(count=20):
+    """批量落地消息"""
+    names = sorted(name for name, _ in default_saplings)
+    return "-4294967295", [(str(-4294967295 - i), names[i % len(names)], 0) for i in range(count)]
+
+
+def measure(name, raw, encode, decode, number=2000):
+    encoded = encode()
+    raw_size = len(json.dumps(raw))
+    encoded_size = len(json.dumps(encoded))
+    encode_time = min(timeit.repeat(encode, number=number, repeat=5)) / number
+    decode_time = min(timeit.repeat(lambda: decode(encoded), number=number, repeat=5)) / number
+    print("{:<14} raw={:<5} encoded={:<5} ({:5.1%}) encode={:6.2f} us decode={:6.2f} us".format(
+        name, raw_size, encoded_size, encoded_size / float(raw_size), encode_time * 1e6, decode_time * 1e6))
+
+
+def main():
+    print("python", sys.version.split()[0])
+    setting = build_master_setting()
+    measure("master_setting", setting, lambda: encode_message(setting), decode_message)
+    delta = build_delta()
+    measure("delta", delta, lambda: encode_message(delta), decode_message)
+    playerId, saplings = build_landings()
+    landings = {"playerId": playerId, "saplings": saplings}
+    measure("landings", landings, lambda: encode_landings(playerId, saplings), decode_landings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+连锁砍树搜索核心的微基准测试。
+
+对比旧的“坐标元组 + set”搜索与SearchBox打包整数搜索在同一棵合成大树上的耗时和内存分配。
+两种实现使用相同的邻居偏移量和数量上限，不做预判和树叶检查，方块直接从字典读取，
+读取的方块数必须一致，差异只来自已搜索标记和坐标的表示方式。
+内存分配用tracemalloc测量（仅Python 3）。
+
+用法（在仓库根目录）：
+    python benchmarks/bench_felling_search.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "saplanting_behavior_pack"))
+
+from SaplantingScripts.config.sapling import BLOCKSURROUNDINGS, DEFAULT_TREE_SPECIES  # noqa: E402
+from SaplantingScripts.server.felling import SearchBox  # noqa: E402
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+LOG_NAME = "minecraft:log"
+LOG = {"name": LOG_NAME, "aux": 3}
+LEAVES = {"name": "minecraft:leaves", "aux": 3}
+ORIGIN = (0, 64, 0)
+# 与未注册树种的默认搜索空间相同，足以容纳整棵合成树，不会截断搜索
+RADIUS = DEFAULT_TREE_SPECIES["radius"]
+HEIGHT = DEFAULT_TREE_SPECIES["height"]
+
+
+def build_tree():
+    """生成一棵2x2树干、带四向分叉的大型丛林树，约250个木头"""
+    blocks = {}
+    for y in range(30):
+        for x in (0, 1):
+            for z in (0, 1):
+                blocks[(x, 64 + y, z)] = LOG
+    for level in range(8, 30, 4):
+        for step in range(1, 6):
+            for dx, dz in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                blocks[(dx * step + (1 if dx > 0 else 0), 64 + level + step // 2, dz * step + (1 if dz > 0 else 0))] = LOG
+    for x in range(-7, 9):
+        for z in range(-7, 9):
+            for y in range(90, 96):
+                blocks.setdefault((x, y, z), LEAVES)
+    del blocks[ORIGIN]  # 玩家破坏的方块
+    return blocks
+
+
+def legacy_search(blocks, limit):
+    """
+    重构前的搜索核心：坐标元组 + set。
+
+    :return: (木头列表, 读取的方块数)
+    """
+    searched = set()
+    affected = []
+    queue = [ORIGIN]
+    while queue:
+        start_pos = queue.pop()
+        for offset in BLOCKSURROUNDINGS:
+            search_pos = start_pos[0] + offset[0], start_pos[1] + offset[1], start_pos[2] + offset[2]
+            if search_pos in searched:
+                continue
+            searched.add(search_pos)
+            block = blocks.get(search_pos)
+            if block is not None and block["name"] == LOG_NAME:
+                affected.append(search_pos)
+                queue.append(search_pos)
+                if len(affected) >= limit:
+                    return affected, len(searched)
+    return affected, len(searched)
+
+
+def packed_search(blocks, limit):
+    """
+    SearchBox搜索核心，与FellingJob.search的循环相同。
+
+    :return: (木头列表, 读取的方块数)
+    """
+    box = SearchBox(ORIGIN, RADIUS, HEIGHT, offsets=BLOCKSURROUNDINGS)
+    visited = box.visited
+    kernel = box.kernel
+    unpack = box.unpack
+    affected = []
+    queue = [box.origin]
+    reads = 0
+    while queue:
+        start = queue.pop()
+        start_x, start_y, start_z = unpack(start)
+        for delta, dx, dy, dz in kernel:
+            index = start + delta
+            if visited[index]:
+                continue
+            visited[index] = 1
+            reads += 1
+            search_pos = start_x + dx, start_y + dy, start_z + dz
+            block = blocks.get(search_pos)
+            if block is not None and block["name"] == LOG_NAME:
+                affected.append(search_pos)
+                queue.append(index)
+                if len(affected) >= limit:
+                    return affected, reads
+    return affected, reads
+
+
+def measure(name, func, blocks, limit, number=100):
+    affected, reads = func(blocks, limit)
+    best = min(timeit.repeat(lambda: func(blocks, limit), number=number, repeat=9)) / number
+    line = "{:<7} limit={:<4} logs={:<4} reads={:<5} {:6.3f} ms/search {:5.2f} us/read".format(
+        name, limit, len(affected), reads, best * 1000, best * 1e6 / reads)
+    if tracemalloc is not None:
+        func(blocks, limit)  # 预先创建SearchBox的边界模板，只测量每次搜索的分配
+        tracemalloc.start()
+        func(blocks, limit)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += " peak={:6.1f} KiB".format(peak / 1024.0)
+    print(line)
+    return sorted(affected), reads
+
+
+def main():
+    blocks = build_tree()
+    print("python", sys.version.split()[0], "logs in world:", sum(1 for b in blocks.values() if b is LOG))
+    for limit in (64, 255):
+        legacy = measure("legacy", legacy_search, blocks, limit)
+        packed = measure("packed", packed_search, blocks, limit)
+        if legacy[1] != packed[1] or len(legacy[0]) != len(packed[0]):
+            print("  warning: the two cores did different work")
+
+
+if __name__ == "__main__":
+    main()
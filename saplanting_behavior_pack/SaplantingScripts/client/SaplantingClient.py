@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
+from collections import deque
 from random import random
 
 import mod.client.extraClientApi as clientApi
 
 from .BaseClientSystem import BaseClientSystem
-from ..config.heyconfig import ClientSetting
+from ..config.heyconfig import ClientSetting, MasterSettingCache
+from ..config.plantable import PlantableTable
 from ..config.sapling import default_saplings
-from ..util.common import Singleton
+from ..util.codec import encode_landings, decode_message
+from ..util.common import Singleton, TimerWheel
 from ..util.listen import Listen
 
 compFactory = clientApi.GetEngineCompFactory()
@@ -22,12 +25,20 @@ class ClientMasterSetting(object):
     __metaclass__ = Singleton
     wait_time_range = 5
     check_time_range = 15
+    notify_interval = 10  # 批量通知服务端的间隔（tick）
+    ticks_per_second = 30  # OnScriptTickClient每秒触发的次数
+    max_checks_per_tick = 8  # 每tick最多检查多少个树苗是否落地
 
     def __init__(self):
         """构造函数，初始化默认配置"""
         self.saplings = default_saplings
+        self.plantable = PlantableTable(self.saplings)
+        self.saplings_revision = 0  # 白名单的版本号，与服务端一致时才能应用增量
+        self.resync_requested = False  # 已请求完整同步，等待服务端发送完整白名单
         self.min_wait_time = 3
         self.check_min_wait_time = 15 + self.min_wait_time
+        self.server_side_detection = False  # 由服务端检测树苗落地时，客户端不再追踪
+        self.max_ground_checks = 8  # 定时检查树苗是否落地的最大次数
 
     def load_config(self, data):
         """
@@ -37,9 +48,36 @@ class ClientMasterSetting(object):
         """
         if "saplings" in data:
             self.saplings = set(tuple(value) for value in data["saplings"])
+            self.plantable = PlantableTable(self.saplings)
+            self.saplings_revision = data.get("saplings_revision", 0)
+            self.resync_requested = False
         if "min_wait_time" in data:
             self.min_wait_time = max(0, data["min_wait_time"])
             self.check_min_wait_time = 15 + self.min_wait_time
+        if "server_side_detection" in data:
+            self.server_side_detection = data["server_side_detection"]
+        if "max_ground_checks" in data:
+            self.max_ground_checks = max(1, data["max_ground_checks"])
+
+    def apply_saplings_delta(self, data):
+        """
+        应用服务端发来的白名单增量。
+
+        :param data: dict, {"revision": 版本号, "add"/"remove": [[物品ID, 附加值], ...]}
+        :return: bool, 版本不连续、需要请求完整同步时返回False
+        """
+        revision = data["revision"]
+        if revision <= self.saplings_revision:
+            return True  # 已包含在之前收到的完整白名单中
+        if revision != self.saplings_revision + 1:
+            return False
+        saplings = set(self.saplings)
+        saplings.update(tuple(value) for value in data.get("add", ()))
+        saplings.difference_update(tuple(value) for value in data.get("remove", ()))
+        self.saplings = saplings
+        self.plantable = PlantableTable(saplings)
+        self.saplings_revision = revision
+        return True
 
     def get_wait_time(self):
         """获取一个随机的等待时间（用于树苗落地后通知服务端）"""
@@ -49,6 +87,10 @@ class ClientMasterSetting(object):
         """获取一个随机的检查间隔时间（用于检查树苗是否落地）"""
         return random() * self.check_time_range + self.check_min_wait_time
 
+    def get_check_wait_ticks(self):
+        """获取一个随机的检查间隔tick数，用于时间轮"""
+        return int(self.get_check_wait_time() * self.ticks_per_second)
+
 
 class SaplantingClient(BaseClientSystem):
     """
@@ -60,7 +102,19 @@ class SaplantingClient(BaseClientSystem):
         self.game_comp = compFactory.CreateGame(self.levelId)
         self.master_setting = ClientMasterSetting()
         self.item_entities = {}  # 追踪世界中的树苗实体
+        # 等待批量通知服务端的落地树苗，{entityId: (物品ID, 附加值)}
+        self.pending_landings = {}  # type: dict[str,tuple[str,int]]
+        self.notify_tick = 0
+        # 定时检查树苗是否落地的时间轮，及到期待检查的树苗
+        self.ground_check_wheel = TimerWheel()
+        self.ground_check_due = deque()
+        self.ground_check_counts = {}  # type: dict[str,int]
+        # AddEntityClientEvent的统计，用于管理员指令#hpldsgstats
+        self.item_stats = {"ignored": 0, "items": 0, "tracked": 0}
         self.client_setting = ClientSetting()
+        # 最近一次收到的完整主配置，进入游戏时哈希一致则直接使用
+        self.master_setting_cache = MasterSettingCache()
+        self.update_item_tracking()
 
     @Listen.on("LoadClientAddonScriptsAfter")
     def on_enabled(self, event=None):
@@ -69,6 +123,7 @@ class SaplantingClient(BaseClientSystem):
         用于加载本地配置和注册配置项。
         """
         self.client_setting.load()
+        self.master_setting_cache.load()
         comp = clientApi.CreateComponent(self.levelId, "HeyPixel", "Config")
         if comp:
             from ..config.heyconfig import register_config
@@ -81,6 +136,7 @@ class SaplantingClient(BaseClientSystem):
         通知服务端当前玩家的连锁砍树设置状态。
         """
         self.NotifyToServer("SyncPlayerTreeFallingState", {"playerId": self.playerId, "state": self.client_setting.tree_felling})
+        self.NotifyToServer("RequestMasterSetting", {"playerId": self.playerId, "hash": self.master_setting_cache.hash})
 
     def reload_client_setting(self):
         """重新加载客户端本地设置，并通知服务端"""
@@ -92,25 +148,76 @@ class SaplantingClient(BaseClientSystem):
         """
         监听服务端发来的主配置同步事件。
         """
+        data = decode_message(data)
         self.master_setting.load_config(data)
+        self.update_item_tracking()
+        if "hash" in data:  # 完整配置，缓存下来供下次进入时使用
+            cache = self.master_setting_cache
+            cache.hash = data["hash"]
+            cache.data = dict((key, value) for key, value in data.items() if key != "hash")
+            cache.save()
+
+    @Listen.server("ConfirmMasterSetting")
+    def on_confirm_master_setting(self, data):
+        """
+        服务端确认缓存的主配置仍然有效，直接加载缓存。
+        """
+        data = decode_message(data)
+        cached = dict(self.master_setting_cache.data)
+        cached["saplings_revision"] = data["saplings_revision"]
+        self.master_setting.load_config(cached)
+        self.update_item_tracking()
+
+    @Listen.server("SyncSaplingsDelta")
+    def on_sync_saplings_delta(self, data):
+        """
+        监听服务端发来的白名单增量，版本不连续时请求完整同步。
+        """
+        data = decode_message(data)
+        master_setting = self.master_setting
+        if master_setting.resync_requested or master_setting.apply_saplings_delta(data):
+            return
+        master_setting.resync_requested = True
+        self.NotifyToServer("RequestSaplingsResync", {"playerId": self.playerId})
 
-    @Listen.on("AddEntityClientEvent")
+    def update_item_tracking(self):
+        """
+        根据是否由服务端检测树苗落地，按需监听或取消监听AddEntityClientEvent。
+        不需要追踪时，客户端不再为每个生成的实体调用监听函数。
+        """
+        if self.master_setting.server_side_detection:
+            self.unlisten_method(self.on_add_sapling_item)
+            # 改由服务端检测，停止追踪已有的树苗，未触发的定时器会因找不到实体而跳过
+            self.item_entities.clear()
+            self.pending_landings.clear()
+            self.ground_check_wheel.clear()
+            self.ground_check_due.clear()
+            self.ground_check_counts.clear()
+        else:
+            self.listen_method(self.on_add_sapling_item)
+
+    @Listen.on("AddEntityClientEvent", lazy=True)
     def on_add_sapling_item(self, event):
         """
         监听实体（这里特指物品）生成事件。
         如果生成的是树苗，则开始追踪它。
+        只在客户端负责检测树苗落地时注册，参考update_item_tracking。
         """
-        engineTypeStr = event["engineTypeStr"]
-        if engineTypeStr == "minecraft:item":
-            itemName = event["itemName"]
-            auxValue = event["auxValue"]
-            item_key = itemName, auxValue
-            # 检查物品是否为已定义的树苗
-            if item_key in self.master_setting.saplings or "sapling" in itemName:
-                entityId = event["id"]
-                self.item_entities[entityId] = item_key
-                # 启动一个定时器，延迟检查树苗是否已落地
-                self.game_comp.AddTimer(self.master_setting.get_check_wait_time(), self.check_on_ground, entityId)
+        item_stats = self.item_stats
+        if event["engineTypeStr"] != "minecraft:item":
+            item_stats["ignored"] += 1
+            return
+        item_stats["items"] += 1
+        itemName = event["itemName"]
+        auxValue = event["auxValue"]
+        # 检查物品是否为已定义的树苗
+        if self.master_setting.plantable.get(itemName, auxValue) is not None:
+            item_stats["tracked"] += 1
+            entityId = event["id"]
+            self.item_entities[entityId] = itemName, auxValue
+            # 加入时间轮，延迟检查树苗是否已落地
+            self.ground_check_counts[entityId] = 0
+            self.ground_check_wheel.schedule(entityId, self.master_setting.get_check_wait_ticks())
 
     @Listen.on("RemoveEntityClientEvent")
     def on_remove_entity(self, event):
@@ -121,6 +228,8 @@ class SaplantingClient(BaseClientSystem):
         entityId = event["id"]
         if entityId in self.item_entities:
             self.item_entities.pop(entityId)
+            self.ground_check_wheel.discard(entityId)
+            self.ground_check_counts.pop(entityId, None)
 
     @Listen.on("OnGroundClientEvent")
     def on_sapling_on_ground(self, event):
@@ -135,23 +244,74 @@ class SaplantingClient(BaseClientSystem):
 
     def on_ground_notify(self, entityId):
         """
-        延迟后，实际通知服务端树苗已落地。
+        延迟后，将落地的树苗加入待通知列表，由flush_landings批量通知服务端。
         """
         if entityId in self.item_entities:
-            itemName, auxValue = self.item_entities[entityId]
-            self.NotifyToServer("onSaplingOnGround", {"playerId": self.playerId, "entityId": entityId, "itemName": itemName, "auxValue": auxValue})
+            self.pending_landings[entityId] = self.item_entities[entityId]
 
-    def check_on_ground(self, entityId):
+    @Listen.on("OnScriptTickClient")
+    def on_tick(self, event=None):
+        """推进落地检查的时间轮，并每隔notify_interval个tick批量发送一次落地通知"""
+        due = self.ground_check_wheel.advance()
+        if due:
+            self.ground_check_due.extend(due)
+        if self.ground_check_due:
+            self.check_on_ground()
+        if self.pending_landings:
+            self.notify_tick += 1
+            if self.notify_tick >= self.master_setting.notify_interval:
+                self.flush_landings()
+
+    def flush_landings(self):
+        """
+        将待通知的落地树苗合并为一条消息发送给服务端。
+        发送前再次过滤已被移除的实体。
         """
-        定时检查一个实体是否在地面上。
+        self.notify_tick = 0
+        saplings = [(entityId, itemName, auxValue) for entityId, (itemName, auxValue) in self.pending_landings.items() if entityId in self.item_entities]
+        self.pending_landings.clear()
+        if saplings:
+            self.NotifyToServer("onSaplingsOnGround", encode_landings(self.playerId, saplings))
+
+    def check_on_ground(self):
+        """
+        检查到期的树苗是否在地面上，每tick最多检查max_checks_per_tick个，其余留到下一tick。
         这是对 OnGroundClientEvent 的一个补充和保障。
+        检查max_ground_checks次仍未落地（如卡在蜘蛛网或水中）的树苗不再定时检查，之后落地时仍会通过落地事件通知。
         """
-        if entityId in self.item_entities:
+        master_setting = self.master_setting
+        due = self.ground_check_due
+        counts = self.ground_check_counts
+        for _ in range(min(len(due), master_setting.max_checks_per_tick)):
+            entityId = due.popleft()
+            if entityId not in self.item_entities:
+                counts.pop(entityId, None)
+                continue
             if compFactory.CreateAttr(entityId).isEntityOnGround():
+                counts.pop(entityId, None)
                 self.on_ground_notify(entityId)
+                continue
+            count = counts.get(entityId, 0) + 1
+            if count >= master_setting.max_ground_checks:
+                counts.pop(entityId, None)
             else:
-                # 如果还没落地，则再设置一个定时器继续检查
-                self.game_comp.AddTimer(self.master_setting.get_check_wait_time(), self.check_on_ground, entityId)
+                # 如果还没落地，则重新加入时间轮继续检查
+                counts[entityId] = count
+                self.ground_check_wheel.schedule(entityId, master_setting.get_check_wait_ticks())
+
+    @Listen.server("RequestClientStats")
+    def on_request_client_stats(self, data=None):
+        """
+        管理员使用#hpldsgstats时，将本客户端的统计信息发给服务端显示。
+        """
+        item_stats = self.item_stats
+        lines = [
+            "§a[落地生根]§f客户端实体监听: {}，非物品{}次，物品{}次，追踪树苗{}个".format(
+                "§a开§f" if self.is_method_listening(self.on_add_sapling_item) else "§c关§f",
+                item_stats["ignored"], item_stats["items"], item_stats["tracked"]),
+            "§a[落地生根]§f客户端落地检测: 追踪{}个，等待通知{}个".format(len(self.item_entities), len(self.pending_landings)),
+        ]
+        self.NotifyToServer("ClientStats", {"playerId": self.playerId, "lines": lines})
 
     def reload_master_setting(self):
         """通知服务端，请求重新加载并同步主配置"""
@@ -2,7 +2,7 @@
 # @Time    : 2023/12/8 14:28
 # @Author  : taokyla
 # @File    : heyconfig.py
-from .modConfig import CLIENT_SETTING_CONFIG_NAME, ModName, ClientSystemName
+from .modConfig import CLIENT_SETTING_CONFIG_NAME, MASTER_SETTING_CACHE_CONFIG_NAME, ModName, ClientSystemName
 from .model.client import ClientSavableConfig
 
 
@@ -22,6 +22,23 @@ class ClientSetting(ClientSavableConfig):
         self.tree_felling = True
 
 
+class MasterSettingCache(ClientSavableConfig):
+    """
+    客户端缓存的最近一次收到的完整主配置及其哈希。
+    进入游戏时把哈希告诉服务端，哈希一致时服务端不再发送完整配置。
+    """
+    _KEY = MASTER_SETTING_CACHE_CONFIG_NAME
+    _ISGLOBAL = False
+
+    hash = ""  # 服务端计算的配置哈希
+    data = {}  # 服务端发送的完整配置
+
+    def __init__(self):
+        """构造函数，初始化为空缓存"""
+        self.hash = ""
+        self.data = {}
+
+
 # 这是一个用于注册到 HeyConfig 配置系统的字典结构。
 # 它详细描述了模组的设置在游戏内GUI中的显示方式和行为。
 register_config = {
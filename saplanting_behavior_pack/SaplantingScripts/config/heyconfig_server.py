@@ -2,6 +2,10 @@
 # @Time    : 2023/12/8 9:41
 # @Author  : taokyla
 # @File    : heyconfig_server.py
+import json
+from hashlib import md5
+from random import random
+
 from .modConfig import MASTER_SETTING_CONFIG_NAME, ModName, ClientSystemName
 from .model.server import ServerSavableConfig
 from .sapling import default_saplings, LOG_BLOCKS
@@ -13,22 +17,49 @@ class MasterSetting(ServerSavableConfig):
     这些配置由房主（Host）在游戏内修改，并会影响整个服务器的游戏行为。
     """
     _KEY = MASTER_SETTING_CONFIG_NAME
+    wait_time_range = 5
+    check_time_range = 15
+    planting_queue_high = 64  # 种植队列积压到此数量时提高客户端的落地等待时间
+    planting_queue_low = 16  # 种植队列回落到此数量时恢复
+    backpressure_wait_time = 10  # 积压时额外增加的落地等待时间（秒）
+    reload_delay = 0.5  # 合并客户端重载配置请求的时间窗口（秒）
+    ticks_per_second = 30  # OnScriptTickServer每秒触发的次数
+    max_checks_per_tick = 8  # 服务端检测模式下每tick最多检查多少个树苗是否落地
 
     saplings = default_saplings  # 自动种植的树苗白名单
     min_wait_time = 3  # 树苗落地的最小等待时间（秒）
+    server_side_detection = True  # 由服务端检测树苗落地，客户端不再追踪和通知
+    max_ground_checks = 8  # 定时检查树苗是否落地的最大次数，超过后放弃检查
+    max_plantings_per_tick = 4  # 每tick最多种植的树苗数
     tree_felling = True  # 连锁砍树功能总开关
     check_leave_persistent_bit = True  # 连锁砍树时是否检查树叶的persistent_bit，用于区分自然生成树和人工建筑
     tree_felling_limit_count = 255  # 连锁砍树一次最多破坏的方块数
+    tree_felling_max_radius = 16  # 连锁砍树搜索的最大水平半径（相对被破坏的方块）
+    tree_felling_max_height = 48  # 连锁砍树搜索的最大高度（相对被破坏的方块）
+    tree_felling_tick_budget = 128  # 连锁砍树每tick最多搜索/破坏的方块数，所有进行中的连锁共享
+    tree_felling_merge_drops = True  # 连锁砍树时合并掉落物，砍完后统一生成，减少掉落物实体数量
+    tree_felling_drops_to_inventory = False  # 合并后的掉落物直接放入玩家背包
     log_blocks = LOG_BLOCKS  # 被识别为“木头”的方块列表
 
     def __init__(self):
         """构造函数，初始化默认配置"""
         self.saplings = default_saplings  # type: set[tuple[str, int]]
         self.min_wait_time = 3
+        self.server_side_detection = True
+        self.max_ground_checks = 8
+        self.max_plantings_per_tick = 4
         self.tree_felling = True
         self.check_leave_persistent_bit = True
         self.tree_felling_limit_count = 255
+        self.tree_felling_max_radius = 16
+        self.tree_felling_max_height = 48
+        self.tree_felling_tick_budget = 128
+        self.tree_felling_merge_drops = True
+        self.tree_felling_drops_to_inventory = False
         self.log_blocks = LOG_BLOCKS
+        # 白名单的版本号，每次变化加1，客户端据此判断增量同步是否有遗漏。只在运行时有效，不保存
+        self._saplings_revision = 0
+        self._client_data_hash = None  # 缓存的客户端配置哈希，配置变化时清空
 
     def load_data(self, data):
         """
@@ -39,9 +70,34 @@ class MasterSetting(ServerSavableConfig):
             data["min_wait_time"] = max(0, data["min_wait_time"])
         if "saplings" in data:
             data["saplings"] = set(tuple(value) for value in data["saplings"])
+            if data["saplings"] != self.saplings:
+                self._saplings_revision += 1  # 整体替换，重载后会向客户端发送完整白名单
         if "log_blocks" in data:
             data["log_blocks"] = set(data["log_blocks"])
         super(MasterSetting, self).load_data(data)
+        self._client_data_hash = None
+
+    @property
+    def saplings_revision(self):
+        """白名单的当前版本号"""
+        return self._saplings_revision
+
+    def toggle_sapling(self, item_key):
+        """
+        添加或移除白名单中的物品。
+
+        :param item_key: tuple, (物品ID, 附加值)
+        :return: tuple, (是否为添加, 发给客户端的增量数据)
+        """
+        added = item_key not in self.saplings
+        if added:
+            self.saplings.add(item_key)
+        else:
+            self.saplings.discard(item_key)
+        self._saplings_revision += 1
+        self._client_data_hash = None
+        delta = {"revision": self._saplings_revision, "add" if added else "remove": [list(item_key)]}
+        return added, delta
 
     def dump(self):
         """
@@ -63,10 +119,42 @@ class MasterSetting(ServerSavableConfig):
         data = {}
         if add_min_wait_time:
             data["min_wait_time"] = self.min_wait_time
+            data["server_side_detection"] = self.server_side_detection
+            data["max_ground_checks"] = self.max_ground_checks
         if add_saplings:
             data["saplings"] = list(list(value) for value in self.saplings)
+            data["saplings_revision"] = self._saplings_revision
+        if add_min_wait_time and add_saplings:
+            data["hash"] = self.get_client_data_hash()
         return data
 
+    def get_client_data_hash(self):
+        """
+        获取完整客户端配置的内容哈希，客户端据此判断缓存的配置是否仍然有效。
+        白名单的版本号只在运行时有效，不参与计算。
+        """
+        if self._client_data_hash is None:
+            data = self.get_client_data(add_saplings=False)
+            data["saplings"] = sorted(list(value) for value in self.saplings)
+            self._client_data_hash = md5(json.dumps(data, sort_keys=True)).hexdigest()
+        return self._client_data_hash
+
+    def get_wait_time(self):
+        """获取一个随机的等待时间（树苗落地后延迟种植）"""
+        return random() * self.wait_time_range + self.min_wait_time
+
+    def get_check_wait_time(self):
+        """获取一个随机的检查间隔时间（用于检查树苗是否落地）"""
+        return random() * self.check_time_range + 15 + self.min_wait_time
+
+    def get_wait_ticks(self):
+        """获取一个随机的等待tick数，用于时间轮"""
+        return int(self.get_wait_time() * self.ticks_per_second)
+
+    def get_check_wait_ticks(self):
+        """获取一个随机的检查间隔tick数，用于时间轮"""
+        return int(self.get_check_wait_time() * self.ticks_per_second)
+
 
 # 用于在 HeyConfig 中注册服务端配置的字典结构。
 # 定义了只有房主（host）才能修改的设置界面。
@@ -117,6 +205,28 @@ register_config_server = {
                     "range": [0],
                     "default": MasterSetting.min_wait_time
                 },
+                {
+                    "name": "gui.saplanting.server.server_side_detection.name",
+                    "key": "server_side_detection",
+                    "type": "toggle",
+                    "default": MasterSetting.server_side_detection
+                },
+                {
+                    "name": "gui.saplanting.server.max_ground_checks.name",
+                    "key": "max_ground_checks",
+                    "type": "input",
+                    "format": "int",
+                    "range": [1],
+                    "default": MasterSetting.max_ground_checks
+                },
+                {
+                    "name": "gui.saplanting.server.max_plantings_per_tick.name",
+                    "key": "max_plantings_per_tick",
+                    "type": "input",
+                    "format": "int",
+                    "range": [1],
+                    "default": MasterSetting.max_plantings_per_tick
+                },
                 {
                     "name": "gui.saplanting.server.tree_felling.name",
                     "key": "tree_felling",
@@ -137,6 +247,42 @@ register_config_server = {
                     "range": [0],
                     "default": MasterSetting.tree_felling_limit_count
                 },
+                {
+                    "name": "gui.saplanting.server.tree_felling_max_radius.name",
+                    "key": "tree_felling_max_radius",
+                    "type": "input",
+                    "format": "int",
+                    "range": [0, 64],
+                    "default": MasterSetting.tree_felling_max_radius
+                },
+                {
+                    "name": "gui.saplanting.server.tree_felling_max_height.name",
+                    "key": "tree_felling_max_height",
+                    "type": "input",
+                    "format": "int",
+                    "range": [0, 128],
+                    "default": MasterSetting.tree_felling_max_height
+                },
+                {
+                    "name": "gui.saplanting.server.tree_felling_tick_budget.name",
+                    "key": "tree_felling_tick_budget",
+                    "type": "input",
+                    "format": "int",
+                    "range": [1],
+                    "default": MasterSetting.tree_felling_tick_budget
+                },
+                {
+                    "name": "gui.saplanting.server.tree_felling_merge_drops.name",
+                    "key": "tree_felling_merge_drops",
+                    "type": "toggle",
+                    "default": MasterSetting.tree_felling_merge_drops
+                },
+                {
+                    "name": "gui.saplanting.server.tree_felling_drops_to_inventory.name",
+                    "key": "tree_felling_drops_to_inventory",
+                    "type": "toggle",
+                    "default": MasterSetting.tree_felling_drops_to_inventory
+                },
                 {
                     "name": "gui.saplanting.reset.name",
                     "type": "button",
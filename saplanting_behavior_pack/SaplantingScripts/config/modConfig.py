@@ -30,3 +30,7 @@ CLIENT_SETTING_CONFIG_NAME = TeamName + ModName + "ClientSetting"
 """客户端配置文件名或键名"""
 MASTER_SETTING_CONFIG_NAME = TeamName + ModName + "MasterSetting"
 """服务端主配置文件名或键名"""
+MASTER_SETTING_CACHE_CONFIG_NAME = TeamName + ModName + "MasterSettingCache"
+"""客户端缓存的服务端主配置的键名"""
+PLACED_LOGS_DATA_NAME = TeamName + ModName + "PlacedLogs"
+"""玩家放置的木头索引在存档附加数据中的键名前缀"""
@@ -34,10 +34,10 @@ class BaseConfig(object):
     def reset(self):
         """
         将实例的配置重置为类中定义的默认值。
-        它通过比较实例属性和类属性来实现。
+        它通过比较实例属性和类属性来实现，以下划线"_"开头的内部状态不会被重置。
         """
         for key in self.__dict__:
-            if key in self.__class__.__dict__:
+            if key in self.__class__.__dict__ and not key.startswith("_"):
                 self.__dict__[key] = self.__class__.__dict__[key]
 
     def get(self, key, default=None):
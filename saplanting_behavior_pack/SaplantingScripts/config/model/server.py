@@ -6,12 +6,23 @@ import mod.server.extraServerApi as serverApi
 
 from .base import SavableConfig
 from ...util.common import dealunicode, Singleton
+from ...util.server_util import GetComponent
 
 # 获取引擎的组件工厂
 compFactory = serverApi.GetEngineCompFactory()
 
 # 创建一个全局的附加数据组件实例，用于读写与当前存档（Level）相关的全局数据
 extraDataComp = compFactory.CreateExtraData(serverApi.GetLevelId())
+gameComp = compFactory.CreateGame(serverApi.GetLevelId())
+
+# 有未写入修改的全局配置，服务端关闭时通过FlushServerConfigs统一写入
+dirtyConfigs = set()
+
+
+def FlushServerConfigs():
+    """立即写入所有有未写入修改的全局配置"""
+    for config in list(dirtyConfigs):
+        config.flush()
 
 
 class ServerSavableConfig(SavableConfig):
@@ -19,23 +30,79 @@ class ServerSavableConfig(SavableConfig):
     服务端全局可持久化配置的实现类。
     它用于存储不与任何特定玩家绑定，而是与整个服务器/存档相关的配置。
     使用了单例模式，确保每个全局配置类在运行时只有一个实例。
+    保存采用延迟写入：save只标记修改并启动定时器，_SAVE_DELAY秒内的多次save只写入一次存档。
+    配置界面等其他途径也会直接写入同一份存档数据，读取和写入前都会先合并这些修改，见merge_stored。
     """
     __metaclass__ = Singleton
+    _SAVE_DELAY = 1.0
+    """合并写入的时间窗口（秒）"""
+    _dirty = False
+    _save_timer = None
+    _stored = None  # 最近一次从存档读取或写入存档的数据，用于识别其他途径写入的修改
+    _merged_changes = False  # 写入时合并了其他途径的修改，下次load时报告为有变化
 
     def load(self):
         """
         从服务端的全局附加数据中加载配置。
+        尚未写入的修改不会被丢弃：与存档中被其他途径修改的配置项合并后立即写入。
+
+        :return: bool, 是否有配置项发生变化
+        """
+        before = dict((key, value) for key, value in self.__dict__.iteritems() if not key.startswith("_"))
+        self.merge_stored()
+        if self._dirty:
+            self.flush()
+        changed = self._merged_changes or any(self.__dict__.get(key) != value for key, value in before.iteritems())
+        self._merged_changes = False
+        return changed
+
+    def merge_stored(self):
+        """
+        读取存档中的数据并加载到内存。
+        有尚未写入的修改时，只加载自上次读写以来被其他途径修改过的配置项，其余配置项保留内存中的修改。
+
+        :return: bool, 是否加载了存档中的配置项
         """
         data = dealunicode(extraDataComp.GetExtraData(self._KEY))
-        if data:
-            self.load_data(data)
+        if not data:
+            return False
+        if self._dirty:
+            last = self._stored or {}
+            changed = dict((key, value) for key, value in data.iteritems() if last.get(key) != value)
+        else:
+            changed = dict(data)
+        self._stored = data
+        if changed:
+            self.load_data(changed)
+        return bool(changed)
 
     def save(self):
         """
-        将当前配置保存到服务端的全局附加数据中。
+        标记配置已修改，并在_SAVE_DELAY秒后写入服务端的全局附加数据。
+        """
+        self._dirty = True
+        dirtyConfigs.add(self)
+        if self._save_timer is None:
+            self._save_timer = gameComp.AddTimer(self._SAVE_DELAY, self.flush)
+
+    def flush(self):
+        """
+        立即写入尚未写入的修改。
+        写入前先合并存档中被其他途径修改过的配置项，避免用旧数据覆盖更新的写入。
         """
-        extraDataComp.SetExtraData(self._KEY, self.dump(), autoSave=True)
+        if self._save_timer is not None:
+            gameComp.CancelTimer(self._save_timer)
+            self._save_timer = None
+        if not self._dirty:
+            return
+        if self.merge_stored():
+            self._merged_changes = True
+        self._dirty = False
+        dirtyConfigs.discard(self)
+        data = self.dump()
+        extraDataComp.SetExtraData(self._KEY, data, autoSave=True)
         extraDataComp.SaveExtraData()
+        self._stored = data
 
 
 class PlayerSavableConfig(SavableConfig):
@@ -50,8 +117,8 @@ class PlayerSavableConfig(SavableConfig):
         :param playerId: str, 该配置实例所关联的玩家ID
         """
         self._playerId = playerId
-        # 为特定玩家创建一个附加数据组件实例，后续的读写都将针对该玩家
-        self._extraDataComp = compFactory.CreateExtraData(playerId)
+        # 从组件池获取该玩家的附加数据组件，后续的读写都将针对该玩家
+        self._extraDataComp = GetComponent("ExtraData", playerId)
 
     @property
     def playerId(self):
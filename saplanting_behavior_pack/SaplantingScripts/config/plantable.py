@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+可种植物品查询表。
+客户端判断是否追踪掉落物、服务端确定种植的方块时共用，避免每个掉落物都做白名单查询和子串匹配。
+"""
+from .sapling import special_saplings
+
+_MISSING = object()
+
+
+class PlantableTable(object):
+    """
+    可种植物品查询表，由白名单和special_saplings编译而成，客户端和服务端共用。
+
+    将(物品ID, 附加值)直接映射为要放置的(方块ID, 附加值)，不可种植时为None。
+    白名单之外、物品ID包含"sapling"的物品同样可以种植，该规则对每个物品ID只判断一次。
+    表创建后不再修改白名单，白名单变化时重新创建。
+    """
+
+    def __init__(self, saplings, special=special_saplings):
+        """
+        :param saplings: iterable, 白名单，(物品ID, 附加值)的集合
+        :param special: dict, 物品到方块的特殊映射
+        """
+        self.saplings = frozenset(saplings)
+        self.special = dict(special)
+        self.table = dict((key, self.special.get(key, key)) for key in self.saplings)
+        self.wildcard = {}  # type: dict[str,bool]
+
+    def __contains__(self, item_key):
+        return self.get(*item_key) is not None
+
+    def get(self, itemName, auxValue):
+        """
+        查询物品种植后对应的方块。
+
+        :param itemName: str, 物品ID
+        :param auxValue: int, 物品附加值
+        :return: tuple/None, (方块ID, 附加值)，不可种植时为None
+        """
+        item_key = itemName, auxValue
+        block = self.table.get(item_key, _MISSING)
+        if block is not _MISSING:
+            return block
+        plantable = self.wildcard.get(itemName)
+        if plantable is None:
+            plantable = self.wildcard[itemName] = "sapling" in itemName
+        block = self.special.get(item_key, item_key) if plantable else None
+        self.table[item_key] = block
+        return block
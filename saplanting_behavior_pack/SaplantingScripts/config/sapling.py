@@ -49,6 +49,17 @@ special_saplings = {
     ("minecraft:pitcher_pod", 0): ("minecraft:pitcher_crop", 0),
 }
 
+# 能否放置还取决于周围方块的种植物，例如甘蔗需要支撑方块旁边有水。
+# 这些方块的放置检查结果不能只按下方方块缓存。
+NEIGHBOUR_DEPENDENT_BLOCKS = {
+    "minecraft:reeds",
+    "minecraft:bamboo",
+    "minecraft:bamboo_sapling",
+    "minecraft:cave_vines",
+    "minecraft:cactus",
+    "minecraft:chorus_flower",
+}
+
 # 被连锁砍树功能识别为“木头”的方块ID集合。
 LOG_BLOCKS = {
     "minecraft:log",
@@ -61,8 +72,14 @@ LOG_BLOCKS = {
     "minecraft:dark_oak_log",
     "minecraft:cherry_log",
     "minecraft:mangrove_log",
+    "minecraft:crimson_stem",
+    "minecraft:warped_stem",
 }
 
+# 默认木头列表中的方块都掉落自身（朝向重置），合并掉落时可以直接累计。
+# 通过#hpldsgmt添加的方块不在其中，仍按原版规则掉落。
+SELF_DROP_LOG_BLOCKS = frozenset(LOG_BLOCKS)
+
 # 用于连锁砍树算法的周围方块偏移量列表。
 # 这个列表只包含同层及上方的17个邻近方块，不包含下方方块。
 # 这样设计是为了让算法向上和向侧方搜索，符合树木的生长形态。
@@ -73,6 +90,12 @@ BLOCKSURROUNDINGS = [
     (1, 1, -1), (-1, 1, 1), (-1, 1, -1), (1, 1, 1)
 ]
 
+# 只包含正上方和同层四个方向的偏移量，用于树干笔直、没有斜向分支的树（白桦、云杉、菌柄）。
+COLUMNSURROUNDINGS = [(0, 1, 0), (1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1)]
+
+# 包含上下左右全部26个邻近方块的偏移量，用于根系向下生长的树（红树）。
+ALLSURROUNDINGS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) != (0, 0, 0)]
+
 # 被连锁砍树功能识别为“树叶”的方块ID集合。
 # 用于判断一个木头方块是否属于“自然生成的树”。
 LEAVE_BLOCKS = {
@@ -83,3 +106,98 @@ LEAVE_BLOCKS = {
     "minecraft:azalea_leaves",
     "minecraft:azalea_leaves_flowered"
 }
+
+# 方块ID中包含这些关键字时视为建筑方块。
+# 连锁砍树预判时，如果木头柱顶端被这类方块覆盖，直接判定为建筑而不再搜索。
+BUILDING_BLOCK_KEYWORDS = (
+    "planks", "stairs", "slab", "fence", "glass", "brick", "wool", "door", "wall", "concrete", "terracotta", "carpet"
+)
+
+# 树种注册表，连锁砍树按树种选择搜索方式。
+# - leaves: 该树种的树叶，persistent_bit为false时视为天然树叶
+# - leaf_type: 旧版树叶（minecraft:leaves/leaves2）的old_leaf_type/new_leaf_type状态需要等于该值，不给出时不检查
+# - markers: 没有persistent_bit状态、但同样说明这是一棵天然树的方块，例如巨型菌的菌块和菌光体
+# - kernel: 搜索时的邻居偏移量
+# - radius/height/depth: 相对被破坏方块的最大水平半径、上方最大高度和下方最大深度
+TREE_SPECIES = {
+    "oak": {
+        "leaves": {"minecraft:leaves", "minecraft:oak_leaves", "minecraft:azalea_leaves", "minecraft:azalea_leaves_flowered"},
+        "leaf_type": "oak",
+        "markers": set(),
+        "kernel": BLOCKSURROUNDINGS, "radius": 8, "height": 32, "depth": 0,
+    },
+    "spruce": {
+        "leaves": {"minecraft:leaves", "minecraft:spruce_leaves"},
+        "leaf_type": "spruce",
+        "markers": set(),
+        "kernel": COLUMNSURROUNDINGS, "radius": 2, "height": 40, "depth": 0,
+    },
+    "birch": {
+        "leaves": {"minecraft:leaves", "minecraft:birch_leaves"},
+        "leaf_type": "birch",
+        "markers": set(),
+        "kernel": COLUMNSURROUNDINGS, "radius": 1, "height": 16, "depth": 0,
+    },
+    "jungle": {
+        "leaves": {"minecraft:leaves", "minecraft:jungle_leaves"},
+        "leaf_type": "jungle",
+        "markers": set(),
+        "kernel": BLOCKSURROUNDINGS, "radius": 12, "height": 48, "depth": 0,
+    },
+    "acacia": {
+        "leaves": {"minecraft:leaves2", "minecraft:acacia_leaves"},
+        "leaf_type": "acacia",
+        "markers": set(),
+        "kernel": BLOCKSURROUNDINGS, "radius": 8, "height": 16, "depth": 0,
+    },
+    "dark_oak": {
+        "leaves": {"minecraft:leaves2", "minecraft:dark_oak_leaves"},
+        "leaf_type": "dark_oak",
+        "markers": set(),
+        "kernel": BLOCKSURROUNDINGS, "radius": 8, "height": 16, "depth": 0,
+    },
+    "cherry": {
+        "leaves": {"minecraft:cherry_leaves"},
+        "markers": set(),
+        "kernel": BLOCKSURROUNDINGS, "radius": 8, "height": 16, "depth": 0,
+    },
+    "mangrove": {
+        "leaves": {"minecraft:mangrove_leaves"},
+        "markers": set(),
+        "kernel": ALLSURROUNDINGS, "radius": 8, "height": 32, "depth": 8,
+    },
+    "crimson": {
+        "leaves": set(),
+        "markers": {"minecraft:nether_wart_block", "minecraft:shroomlight"},
+        "kernel": COLUMNSURROUNDINGS, "radius": 2, "height": 32, "depth": 0,
+    },
+    "warped": {
+        "leaves": set(),
+        "markers": {"minecraft:warped_wart_block", "minecraft:shroomlight"},
+        "kernel": COLUMNSURROUNDINGS, "radius": 2, "height": 32, "depth": 0,
+    },
+}
+
+# 旧版树叶区分树种的方块状态
+LEAF_TYPE_STATES = ("old_leaf_type", "new_leaf_type")
+
+# 未注册的木头（例如通过#hpldsgmt添加的模组木头）使用的默认搜索方式
+DEFAULT_TREE_SPECIES = {
+    "leaves": LEAVE_BLOCKS,
+    "markers": set(),
+    "kernel": BLOCKSURROUNDINGS, "radius": 16, "height": 48, "depth": 0,
+}
+
+# 树木类型（SaplantingServer.get_tree_type的返回值）到树种的映射
+TREE_TYPE_SPECIES = {
+    "oak": "oak", "minecraft:oak_log": "oak",
+    "spruce": "spruce", "minecraft:spruce_log": "spruce",
+    "birch": "birch", "minecraft:birch_log": "birch",
+    "jungle": "jungle", "minecraft:jungle_log": "jungle",
+    "acacia": "acacia", "minecraft:acacia_log": "acacia",
+    "dark_oak": "dark_oak", "minecraft:dark_oak_log": "dark_oak",
+    "minecraft:cherry_log": "cherry",
+    "minecraft:mangrove_log": "mangrove",
+    "minecraft:crimson_stem": "crimson",
+    "minecraft:warped_stem": "warped",
+}
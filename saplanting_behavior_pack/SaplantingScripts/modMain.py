@@ -54,4 +54,10 @@ class SaplantingMod(object):
         当服务端关闭或卸载模组时，此函数会被引擎调用。
         可用于清理服务端资源或保存数据。
         """
-        pass
+        # 写入延迟保存中尚未写入的配置
+        from .config.model.server import FlushServerConfigs
+        FlushServerConfigs()
+        # 写回定时写入之间修改过的玩家放置的木头索引
+        system = serverApi.GetSystem(ModName, ServerSystemName)
+        if system is not None:
+            system.placed_logs.flush()
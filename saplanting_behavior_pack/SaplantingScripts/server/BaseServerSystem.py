@@ -25,6 +25,8 @@ class BaseServerSystem(serverApi.GetServerSystemCls()):
         """
         super(BaseServerSystem, self).__init__(namespace, name)
         self.levelId = serverApi.GetLevelId()
+        # 通过listen_method注册的监听函数，{方法名: 绑定方法}
+        self.listen_handlers = {}
         self.onRegister()
 
     def onRegister(self):
@@ -36,10 +38,47 @@ class BaseServerSystem(serverApi.GetServerSystemCls()):
         for key in dir(self):
             obj = getattr(self, key)
             if callable(obj) and hasattr(obj, 'listen_event'):
-                event = getattr(obj, "listen_event")
-                _type = getattr(obj, "listen_type")
-                priority = getattr(obj, "listen_priority")
-                self.listen(event, obj, _type=_type, priority=priority)
+                if getattr(obj, "listen_lazy", False):
+                    continue  # 按需注册
+                self.listen_method(obj)
+
+    def listen_method(self, method):
+        """
+        注册一个被@Listen装饰的方法，已注册的方法不会重复注册。
+
+        :param method: 被@Listen装饰的绑定方法
+        """
+        key = method.__name__
+        if key in self.listen_handlers:
+            return
+        self.listen_handlers[key] = method
+        self.listen(method.listen_event, method, _type=method.listen_type, priority=method.listen_priority)
+
+    def unlisten_method(self, method):
+        """
+        取消通过listen_method注册的方法。
+
+        :param method: 被@Listen装饰的绑定方法
+        """
+        handler = self.listen_handlers.pop(method.__name__, None)
+        if handler is not None:
+            self.unlisten(method.listen_event, handler, _type=method.listen_type, priority=method.listen_priority)
+
+    def set_method_listening(self, method, enabled):
+        """
+        按需注册或取消一个被@Listen(lazy=True)装饰的方法，用于只在有需求时才监听的高频事件。
+
+        :param method: 被@Listen装饰的绑定方法
+        :param enabled: bool, 是否监听
+        """
+        if enabled:
+            self.listen_method(method)
+        else:
+            self.unlisten_method(method)
+
+    def is_method_listening(self, method):
+        """方法当前是否已通过listen_method注册"""
+        return method.__name__ in self.listen_handlers
 
     def listen(self, event, func, _type=Listen.minecraft, priority=0):
         """
@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict, deque
+
 import mod.server.extraServerApi as serverApi
 from mod.common.minecraftEnum import ItemPosType, Facing
 
 from .BaseServerSystem import BaseServerSystem
+from .felling import FellingJob, FellingScheduler
+from .placed_logs import PlacedLogIndex
+from .tree_cache import TreeStructureCache
 from ..config.heyconfig_server import MasterSetting
-from ..config.sapling import special_saplings, BLOCKSURROUNDINGS, LEAVE_BLOCKS
-from ..util.common import get_block_pos
-from ..util.listen import Listen, ServerChatEvent, DelServerPlayerEvent
-from ..util.server_util import isAxe
+from ..config.model.server import extraDataComp
+from ..config.modConfig import PLACED_LOGS_DATA_NAME
+from ..config.plantable import PlantableTable
+from ..config.sapling import NEIGHBOUR_DEPENDENT_BLOCKS, SELF_DROP_LOG_BLOCKS
+from ..util.codec import encode_message, decode_landings
+from ..util.common import get_block_pos, ExpiringTable, LRUCache, TimerWheel
+from ..util.listen import Listen, ServerChatEvent, DelServerPlayerEvent, BlockRemoveServerEvent, EntityPlaceBlockAfterServerEvent, PistonActionServerEvent
+from ..util.server_util import isAxe, GetToolTier, GetComponent, ReleaseComponents, componentPool, componentPoolStats, GetLogDropItem, AddItemToPlayerInventory, SpawnItemStacksToLevel
 
 compFactory = serverApi.GetEngineCompFactory()
 
@@ -23,8 +32,39 @@ class SaplantingServer(BaseServerSystem):
         self.masterId = None  # 通常是第一个进入世界的玩家，拥有配置权限
         # 记录玩家连锁砍树的开关状态
         self.player_tree_falling_state = {}  # type: dict[str,bool]
+        # 玩家手持物品缓存，{playerId: (物品ID, 附加值, 是否为斧头, 工具等级)}
+        self.player_carried = {}  # type: dict[str,tuple[str,int,bool,int]]
+        # 当前手持斧头的玩家，用于按需监听DestroyBlockEvent
+        self.player_holding_axe = set()  # type: set[str]
+        # 服务端检测模式下追踪的树苗掉落物，{entityId: (物品ID, 附加值)}
+        self.sapling_entities = {}  # type: dict[str,tuple[str,int]]
+        self.sapling_checks = {}  # type: dict[str,int]  # 追踪的树苗已经安排的检查次数
+        # 检查追踪的树苗是否落地的时间轮，及到期待检查的树苗
+        self.sapling_check_wheel = TimerWheel()
+        self.sapling_check_due = deque()
+        # 最近处理过的树苗掉落物，多个客户端重复通知同一个实体时直接跳过
+        self.handled_saplings = ExpiringTable(ttl=30)
+        self.sapling_stats = {"handled": 0, "suppressed": 0}
+        # 客户端的重载配置请求在一个时间窗口内合并为一次重载
+        self.reload_timer = None
+        # 等待种植的树苗，按(维度, 种植坐标)合并，在tick中分批种植
+        self.planting_queue = OrderedDict()  # type: OrderedDict[tuple, tuple]
+        # 种植队列积压时提高客户端的落地等待时间
+        self.planting_backpressure = False
+        # 放置检查结果缓存，{(物品ID, 附加值, 下方方块ID, 下方方块附加值, 目标方块ID, 目标方块附加值): bool}，不缓存依赖周围方块的种植物
+        self.may_place_cache = LRUCache(512)
         # 用于防止连锁砍树时重复触发破坏事件
         self.player_destroying = {}  # type: dict[str,set]
+        # 合并掉落模式下正在以玩家身份破坏、需要取消原版掉落物的木头，{(playerId, 坐标)}
+        self.merging_drops = set()  # type: set[tuple[str,tuple]]
+        # 最近被判定为建筑的木头结构，再次破坏时跳过搜索
+        self.tree_cache = TreeStructureCache()
+        # 连锁砍树任务调度器，按tick分批执行搜索和破坏
+        self.felling_scheduler = FellingScheduler(self, self.tree_cache)
+        # 玩家放置的木头索引，按区块保存在存档中
+        self.placed_logs = PlacedLogIndex(extraDataComp, PLACED_LOGS_DATA_NAME)
+        # 已通过ListenOnBlockRemoveEvent监听移除事件的木头方块
+        self.block_remove_listened = set()
         # 初始化引擎组件
         self.game_comp = compFactory.CreateGame(self.levelId)
         self.item_comp = compFactory.CreateItem(self.levelId)
@@ -34,26 +74,84 @@ class SaplantingServer(BaseServerSystem):
         # 加载服务端主配置
         self.master_setting = MasterSetting()
         self.master_setting.load()
+        # 由白名单编译的可种植物品表，白名单变化时重新创建
+        self.plantable = PlantableTable(self.master_setting.saplings)
+        # 定期写回玩家放置的木头索引
+        self.game_comp.AddRepeatedTimer(30, self.placed_logs.flush)
+        self.update_sapling_tracking()
 
     @Listen.on("OnCarriedNewItemChangedServerEvent")
     def on_player_hand_item_change(self, event):
         """
         监听玩家手持物品变化事件。
-        如果玩家切换到斧头，则提示其连锁砍树的开关状态。
+        记录玩家是否手持斧头，如果玩家切换到斧头，则提示其连锁砍树的开关状态。
         """
-        if not self.master_setting.tree_felling:
-            return
-        newItemDict = event["newItemDict"]
-        if newItemDict and isAxe(newItemDict["newItemName"], newItemDict["newAuxValue"]):
-            playerId = event["playerId"]
+        playerId = event["playerId"]
+        if self.set_player_carried(playerId, event["newItemDict"]) and self.master_setting.tree_felling:
             state = self.player_tree_falling_state.get(playerId, False)
             self.game_comp.SetOneTipMessage(playerId, "连锁砍树:{}".format("§a开" if state else "§c关"))
 
+    @Listen.on("InventoryItemChangedServerEvent")
+    def on_player_inventory_item_change(self, event):
+        """
+        监听玩家背包物品变化事件。
+        手上的物品被替换、损坏或移走时不一定触发手持物品变化事件，选中槽位中的物品发生变化时同步更新缓存。
+        在两个相同物品或两个空槽位之间切换不会触发手持物品变化事件，因此每次都重新读取选中的槽位。
+        """
+        playerId = event["playerId"]
+        if event["slot"] == GetComponent("Item", playerId).GetSelectSlotId():
+            self.set_player_carried(playerId, event["newItemDict"])
+
+    def set_player_carried(self, playerId, itemDict):
+        """
+        更新玩家手持物品缓存，并按需更新DestroyBlockEvent的监听。
+
+        :param playerId: str, 玩家ID
+        :param itemDict: dict/None, 手持物品的物品信息字典
+        :return: bool, 玩家是否手持斧头
+        """
+        if itemDict and itemDict.get("count", 1) > 0:
+            itemName, auxValue = itemDict["newItemName"], itemDict["newAuxValue"]
+            carried = self.player_carried.get(playerId)
+            if carried is None or carried[0] != itemName or carried[1] != auxValue:
+                is_axe = isAxe(itemName, auxValue)
+                carried = self.player_carried[playerId] = itemName, auxValue, is_axe, GetToolTier(itemName, auxValue) if is_axe else 0
+            is_axe = carried[2]
+        else:
+            self.player_carried.pop(playerId, None)
+            is_axe = False
+        if is_axe:
+            if playerId not in self.player_holding_axe:
+                self.player_holding_axe.add(playerId)
+                self.update_felling_listen()
+        elif playerId in self.player_holding_axe:
+            self.player_holding_axe.discard(playerId)
+            # 剩余的木头会以玩家当前手持的物品破坏，不再继续
+            self.felling_scheduler.cancel(playerId, give_loot=True)
+            self.update_felling_listen()
+        return is_axe
+
     @Listen.client("SyncPlayerTreeFallingState")
     def on_sync_player_tree_falling_state(self, event):
         """监听客户端同步过来的连锁砍树开关状态"""
         playerId = event["__id__"] if "__id__" in event else event["playerId"]
         self.player_tree_falling_state[playerId] = event["state"]
+        if not event["state"]:
+            self.felling_scheduler.cancel(playerId, give_loot=True)  # 关闭后不再继续进行中的连锁
+        # 玩家进入游戏时不会触发手持物品变化事件，没有缓存时读取一次
+        if playerId not in self.player_carried:
+            self.set_player_carried(playerId, GetComponent("Item", playerId).GetPlayerItem(ItemPosType.CARRIED))
+        self.update_felling_listen()
+
+    def update_felling_listen(self):
+        """
+        只在至少一名在线玩家开启了连锁砍树且手持斧头时监听DestroyBlockEvent，
+        其余时间破坏方块不会调用Python监听函数。
+        """
+        master_setting = self.master_setting
+        demand = master_setting.tree_felling and master_setting.tree_felling_limit_count > 0 and any(
+            self.player_tree_falling_state.get(playerId, False) for playerId in self.player_holding_axe)
+        self.set_method_listening(self.on_player_destroy_block, demand)
 
     @Listen.on(ServerChatEvent)
     def on_command(self, event):
@@ -65,26 +163,24 @@ class SaplantingServer(BaseServerSystem):
             message = event["message"].lower()
             if message == "#hpldsg":  # 添加/移除自动种植白名单
                 event["cancel"] = True
-                handItem = compFactory.CreateItem(playerId).GetPlayerItem(ItemPosType.CARRIED)
+                handItem = GetComponent("Item", playerId).GetPlayerItem(ItemPosType.CARRIED)
                 if not handItem:
                     self.msg_comp.NotifyOneMessage(playerId, "§a[落地生根]§c没有物品在手上，添加失败")
                     return
                 item_key = handItem["newItemName"], handItem["newAuxValue"]
-                if item_key not in self.master_setting.saplings:
-                    self.master_setting.saplings.add(item_key)
-                    self.master_setting.save()
-                    data = self.master_setting.get_client_data(add_min_wait_time=False)
-                    self.BroadcastToAllClient("SyncMasterSetting", data)
+                added, delta = self.master_setting.toggle_sapling(item_key)
+                self.master_setting.save()
+                self.plantable = PlantableTable(self.master_setting.saplings)
+                self.may_place_cache.clear()
+                # 只同步变化的物品，客户端发现版本不连续时会请求完整同步
+                self.BroadcastToAllClient("SyncSaplingsDelta", encode_message(delta))
+                if added:
                     self.msg_comp.NotifyOneMessage(playerId, "§a[落地生根]§a添加方块{}:{}到白名单成功".format(*item_key))
                 else:
-                    self.master_setting.saplings.discard(item_key)
-                    self.master_setting.save()
-                    data = self.master_setting.get_client_data(add_min_wait_time=False)
-                    self.BroadcastToAllClient("SyncMasterSetting", data)
                     self.msg_comp.NotifyOneMessage(playerId, "§a[落地生根]§a方块{}:{}已移出白名单".format(*item_key))
             elif message == "#hpldsgmt":  # 添加/移除树木方块识别列表
                 event["cancel"] = True
-                handItem = compFactory.CreateItem(playerId).GetPlayerItem(ItemPosType.CARRIED)
+                handItem = GetComponent("Item", playerId).GetPlayerItem(ItemPosType.CARRIED)
                 if not handItem:
                     self.msg_comp.NotifyOneMessage(playerId, "§a[落地生根]§c没有物品在手上，添加失败")
                     return
@@ -92,20 +188,69 @@ class SaplantingServer(BaseServerSystem):
                 if item_name not in self.master_setting.log_blocks:
                     self.master_setting.log_blocks.add(item_name)
                     self.master_setting.save()
+                    self.update_block_remove_listen()
                     self.msg_comp.NotifyOneMessage(playerId, "§a[落地生根]§a已添加方块{}为木头，忽略子id".format(item_name))
                 else:
                     self.master_setting.log_blocks.discard(item_name)
                     self.master_setting.save()
+                    self.update_block_remove_listen()
                     self.msg_comp.NotifyOneMessage(playerId, "§a[落地生根]§a已取消将方块{}识别为木头".format(item_name))
+            elif message == "#hpldsgstats":  # 查看运行统计
+                event["cancel"] = True
+                for line in self.get_stats_messages():
+                    self.msg_comp.NotifyOneMessage(playerId, line)
+                # 客户端的统计由客户端回复，见on_client_stats
+                self.NotifyToClient(playerId, "RequestClientStats", {})
+
+    def get_stats_messages(self):
+        """
+        获取运行统计信息，用于管理员指令#hpldsgstats。
+
+        :return: list[str], 每行一条的统计信息
+        """
+        felling_stats = self.felling_scheduler.stats
+        return [
+            "§a[落地生根]§f连锁砍树: 任务{}个(进行中{}个)，已砍伐{}个方块".format(felling_stats["jobs"], len(self.felling_scheduler), felling_stats["felled"]),
+            "§a[落地生根]§f方块快照: 命中{}次，查询引擎{}次，命中率{:.1%}".format(felling_stats["hits"], felling_stats["misses"], self.felling_scheduler.get_hit_rate()),
+            "§a[落地生根]§f落地种植: 处理{}次，跳过重复通知{}次".format(self.sapling_stats["handled"], self.sapling_stats["suppressed"]),
+            "§a[落地生根]§f组件池: 缓存{}个，复用{}次，创建{}次".format(len(componentPool), componentPoolStats["reused"], componentPoolStats["created"]),
+        ]
+
+    @Listen.client("ClientStats")
+    def on_client_stats(self, event):
+        """
+        显示客户端回复的统计信息。
+        """
+        playerId = event["__id__"] if "__id__" in event else event["playerId"]
+        for line in event["lines"]:
+            self.msg_comp.NotifyOneMessage(playerId, line)
 
     @Listen.client("ReloadMasterSetting")
     def on_reload_master_setting(self, event=None):
         """
         监听客户端请求重载配置的事件。
+        配置界面修改后每个客户端都会请求一次，同一时间窗口内的请求只重载一次。
         """
-        self.master_setting.load()
-        data = self.master_setting.get_client_data(add_saplings=False)
-        self.BroadcastToAllClient("SyncMasterSetting", data)
+        if self.reload_timer is None:
+            self.reload_timer = self.game_comp.AddTimer(self.master_setting.reload_delay, self.reload_master_setting)
+
+    def reload_master_setting(self):
+        """
+        重新加载主配置并同步给所有客户端，配置没有变化时跳过。
+        """
+        self.reload_timer = None
+        saplings_revision = self.master_setting.saplings_revision
+        if not self.master_setting.load():
+            return
+        self.plantable = PlantableTable(self.master_setting.saplings)
+        self.update_block_remove_listen()
+        self.update_felling_listen()
+        self.update_sapling_tracking()
+        self.may_place_cache.clear()
+        # 白名单被整体替换时一起发送完整白名单，客户端不需要等到下一个增量才发现版本不连续
+        data = self.master_setting.get_client_data(add_saplings=self.master_setting.saplings_revision != saplings_revision)
+        self.sync_master_setting(data)
+        self.planting_backpressure = False  # 已广播原始等待时间，队列仍积压时会重新提高
 
     @Listen.on("LoadServerAddonScriptsAfter")
     def on_enabled(self, event=None):
@@ -116,6 +261,77 @@ class SaplantingServer(BaseServerSystem):
         if comp:
             from ..config.heyconfig_server import register_config_server
             comp.register_config(register_config_server)
+        self.update_block_remove_listen()
+
+    def update_block_remove_listen(self):
+        """
+        使木头方块触发BlockRemoveServerEvent，用于维护结构缓存。
+        木头列表或树叶检查设置可能已经变化，同时清空结构缓存。
+        """
+        log_blocks = self.master_setting.log_blocks
+        for name in log_blocks - self.block_remove_listened:
+            self.block_info_comp.ListenOnBlockRemoveEvent(name, True)
+        for name in self.block_remove_listened - log_blocks:
+            self.block_info_comp.ListenOnBlockRemoveEvent(name, False)
+        self.block_remove_listened = set(log_blocks)
+        self.tree_cache.clear()
+
+    @Listen.on(BlockRemoveServerEvent)
+    def on_block_remove(self, event):
+        """木头方块被移除，更新结构缓存和玩家放置的木头索引"""
+        pos = event["x"], event["y"], event["z"]
+        self.tree_cache.on_block_removed(event["dimension"], pos)
+        self.placed_logs.discard(event["dimension"], pos)
+
+    @Listen.on(EntityPlaceBlockAfterServerEvent)
+    def on_entity_place_block(self, event):
+        """记录玩家放置的木头；放置的木头可能连通了缓存中的结构，使其周围的结构失效"""
+        if event["fullName"] in self.master_setting.log_blocks:
+            pos = event["x"], event["y"], event["z"]
+            self.placed_logs.add(event["dimensionId"], pos)
+            self.tree_cache.invalidate_around(event["dimensionId"], pos)
+
+    @Listen.on("ChunkLoadedServerEvent")
+    def on_chunk_loaded(self, event):
+        """区块加载时读取其中玩家放置的木头"""
+        self.placed_logs.load_chunk(event["dimension"], event["chunkPosX"], event["chunkPosZ"])
+
+    @Listen.on("ChunkAcquireDiscardedServerEvent")
+    def on_chunk_discarded(self, event):
+        """
+        区块卸载时写回并释放其中玩家放置的木头。
+        随区块卸载的实体不会触发EntityRemoveEvent，在这里停止追踪并释放它们的池化组件。
+        """
+        self.placed_logs.unload_chunk(event["dimension"], event["chunkPosX"], event["chunkPosZ"])
+        for entityId in event.get("entities", ()):
+            self.stop_tracking_sapling(entityId)
+            ReleaseComponents(entityId)
+
+    @Listen.on(PistonActionServerEvent)
+    def on_piston_action(self, event):
+        """活塞移动或破坏方块，使受影响位置周围的结构失效"""
+        self.tree_cache.on_piston_action(event["dimensionId"], event["pistonMoveFacing"], event["blockList"], event["breakBlockList"])
+
+    def sync_master_setting(self, data, playerId=None):
+        """
+        编码并发送主配置同步消息。
+
+        :param data: dict, 配置数据，见MasterSetting.get_client_data
+        :param playerId: str, 接收的玩家ID，为None时广播给所有客户端
+        """
+        data = encode_message(data)
+        if playerId is None:
+            self.BroadcastToAllClient("SyncMasterSetting", data)
+        else:
+            self.NotifyToClient(playerId, "SyncMasterSetting", data)
+
+    @Listen.client("RequestSaplingsResync")
+    def on_request_saplings_resync(self, event):
+        """
+        客户端发现白名单增量的版本不连续，发送完整的白名单。
+        """
+        playerId = event["__id__"] if "__id__" in event else event["playerId"]
+        self.sync_master_setting(self.master_setting.get_client_data(add_min_wait_time=False), playerId)
 
     @Listen.on("ClientLoadAddonsFinishServerEvent")
     def on_player_login_finish(self, event):
@@ -126,8 +342,19 @@ class SaplantingServer(BaseServerSystem):
         if self.masterId is None:  # 将第一个进入的玩家设为管理员
             self.masterId = playerId
         self.player_destroying[playerId] = set()
-        # 将主配置同步给刚进入的玩家
-        self.NotifyToClient(playerId, "SyncMasterSetting", self.master_setting.get_client_data())
+        # 主配置由客户端携带缓存的哈希请求，见on_request_master_setting
+
+    @Listen.client("RequestMasterSetting")
+    def on_request_master_setting(self, event):
+        """
+        玩家进入游戏后请求主配置，客户端缓存的配置哈希一致时只确认，不再发送完整配置。
+        """
+        playerId = event["__id__"] if "__id__" in event else event["playerId"]
+        master_setting = self.master_setting
+        if event.get("hash") == master_setting.get_client_data_hash():
+            self.NotifyToClient(playerId, "ConfirmMasterSetting", encode_message({"saplings_revision": master_setting.saplings_revision}))
+        else:
+            self.sync_master_setting(master_setting.get_client_data(), playerId)
 
     @Listen.on(DelServerPlayerEvent)
     def on_player_leave(self, event):
@@ -137,43 +364,253 @@ class SaplantingServer(BaseServerSystem):
         playerId = event["id"]
         if playerId in self.player_destroying:
             self.player_destroying.pop(playerId)
+        self.felling_scheduler.cancel(playerId)
+        self.merging_drops = set(key for key in self.merging_drops if key[0] != playerId)
+        self.player_carried.pop(playerId, None)
+        self.player_holding_axe.discard(playerId)
+        self.update_felling_listen()
+        ReleaseComponents(playerId)
 
-    @Listen.client("onSaplingOnGround")
-    def on_sapling_on_ground(self, event):
+    @Listen.on("OnScriptTickServer")
+    def on_tick(self, event=None):
         """
-        监听客户端发来的树苗落地事件，执行种树逻辑。
+        服务端tick事件（每秒30次），用于推进连锁砍树任务、树苗落地检查和种植队列。
         """
-        playerId = event["__id__"] if "__id__" in event else event["playerId"]
-        entityId = event["entityId"]
+        self.felling_scheduler.tick(self.master_setting.tree_felling_tick_budget)
+        due = self.sapling_check_wheel.advance()
+        if due:
+            self.sapling_check_due.extend(due)
+        if self.sapling_check_due:
+            self.check_saplings_on_ground()
+        if self.planting_queue:
+            self.drain_planting_queue(self.master_setting.max_plantings_per_tick)
+
+    @Listen.client("onSaplingsOnGround")
+    def on_saplings_on_ground(self, event):
+        """
+        监听客户端批量发来的树苗落地事件，一次处理一批。
+        每一项为(实体ID, 物品ID, 附加值)。
+        """
+        if self.master_setting.server_side_detection:
+            return  # 由服务端检测时忽略客户端的通知，避免重复处理
+        playerId, saplings = decode_landings(event)
+        if "__id__" in event:
+            playerId = event["__id__"]
+        plant_sapling = self.plant_sapling
+        for entityId, itemName, auxValue in saplings:
+            plant_sapling(entityId, itemName, auxValue, playerId)
+
+    def update_sapling_tracking(self):
+        """
+        根据是否由服务端检测树苗落地，按需监听或取消监听实体生成和落地事件。
+        改由客户端检测时停止追踪已有的树苗。
+        """
+        enabled = self.master_setting.server_side_detection
+        self.set_method_listening(self.on_add_entity, enabled)
+        self.set_method_listening(self.on_entity_on_ground, enabled)
+        if not enabled:
+            self.sapling_entities.clear()
+            self.sapling_checks.clear()
+            self.sapling_check_wheel.clear()
+            self.sapling_check_due.clear()
+
+    @Listen.on("AddEntityServerEvent", lazy=True)
+    def on_add_entity(self, event):
+        """
+        服务端检测模式下，由服务端追踪生成的树苗掉落物，不再依赖客户端通知。
+        只在服务端检测模式下注册，参考update_sapling_tracking。
+        """
+        if event["engineTypeStr"] == "minecraft:item":
+            itemName = event["itemName"]
+            auxValue = event["auxValue"]
+            if self.plantable.get(itemName, auxValue) is not None:
+                entityId = event["id"]
+                self.sapling_entities[entityId] = itemName, auxValue
+                # 从存档加载的掉落物可能已经在地面上，不会再触发落地事件，延迟检查一次作为补充
+                self.schedule_sapling_check(entityId)
+
+    @Listen.on("OnGroundServerEvent", lazy=True)
+    def on_entity_on_ground(self, event):
+        """
+        服务端检测模式下，追踪的树苗落地后延迟种植，种植队列积压时同样延长等待时间。
+        落地后的等待同样放入时间轮，到期时确认仍在地面上再种植。
+        """
+        entityId = event["id"]
+        if entityId in self.sapling_entities:
+            master_setting = self.master_setting
+            wait_ticks = master_setting.get_wait_ticks()
+            if self.planting_backpressure:
+                wait_ticks += master_setting.backpressure_wait_time * master_setting.ticks_per_second
+            self.sapling_check_wheel.schedule(entityId, wait_ticks)
+
+    @Listen.on("EntityRemoveEvent")
+    def on_entity_remove(self, event):
+        """掉落物被捡起或清除，停止追踪，并释放该实体的池化组件。随区块卸载的实体见on_chunk_discarded"""
+        entityId = event["id"]
+        self.stop_tracking_sapling(entityId)
+        ReleaseComponents(entityId)
+
+    def stop_tracking_sapling(self, entityId):
+        """停止追踪一个树苗掉落物"""
+        if self.sapling_entities.pop(entityId, None) is not None:
+            self.sapling_checks.pop(entityId, None)
+            self.sapling_check_wheel.discard(entityId)
+
+    def schedule_sapling_check(self, entityId):
+        """
+        在时间轮中安排一次检查，确认追踪的树苗是否在地面上，作为OnGroundServerEvent的补充。
+        共检查max_ground_checks次后不再检查，之后落地时仍会通过落地事件种植。
+        """
+        times = self.sapling_checks.get(entityId, 0)
+        if times < self.master_setting.max_ground_checks:
+            self.sapling_checks[entityId] = times + 1
+            self.sapling_check_wheel.schedule(entityId, self.master_setting.get_check_wait_ticks())
+
+    def check_saplings_on_ground(self):
+        """检查到期的树苗是否在地面上，每tick最多检查max_checks_per_tick个，其余留到下一tick"""
+        due = self.sapling_check_due
+        for _ in range(min(len(due), self.master_setting.max_checks_per_tick)):
+            self.check_sapling_on_ground(due.popleft())
+
+    def check_sapling_on_ground(self, entityId):
+        """检查追踪的树苗是否在地面上，在地面上时种植，否则稍后再检查"""
+        if entityId in self.sapling_entities:
+            if GetComponent("Attr", entityId).isEntityOnGround():
+                self.plant_tracked_sapling(entityId)
+            else:
+                self.schedule_sapling_check(entityId)
+
+    def plant_tracked_sapling(self, entityId):
+        """
+        种植服务端追踪的树苗。
+        种植前不停止追踪，没能种植时（例如落在无效位置，之后可能漂到可种植的位置）稍后重试，
+        直到种植成功后掉落物被销毁，或掉落物被捡起、清除。
+        """
+        if entityId in self.sapling_entities:
+            itemName, auxValue = self.sapling_entities[entityId]
+            if not self.plant_sapling(entityId, itemName, auxValue):
+                self.retry_tracked_sapling(entityId)
+
+    def retry_tracked_sapling(self, entityId):
+        """追踪的树苗没能种植，允许再次处理该实体，并稍后重新检查"""
+        if entityId in self.sapling_entities:
+            self.handled_saplings.discard(entityId)
+            self.schedule_sapling_check(entityId)
+
+    def plant_sapling(self, entityId, itemName, auxValue, playerId=None):
+        """
+        检查落地的树苗掉落物能否种植，可以种植时加入种植队列。
+
+        :param entityId: str, 掉落物实体ID
+        :param itemName: str, 物品ID
+        :param auxValue: int, 物品附加值
+        :param playerId: str, 用于检查能否放置的玩家，为None时只使用MayPlace检查
+        :return: bool, 是否已加入种植队列或正在处理中
+        """
+        # 同一个实体在有效期内只处理一次，种植后重新生成的掉落物是新实体，不受影响
+        if not self.handled_saplings.add(entityId):
+            self.sapling_stats["suppressed"] += 1
+            return True
+        self.sapling_stats["handled"] += 1
+        block_key = self.plantable.get(itemName, auxValue)
+        if block_key is None:
+            return False  # 不在白名单中
         if not self.game_comp.IsEntityAlive(entityId):
-            return  # 实体可能已经被捡起或消失
+            return False  # 实体可能已经被捡起或消失
         
-        dim = compFactory.CreateDimension(entityId).GetEntityDimensionId()
-        item_entity_pos = compFactory.CreatePos(entityId).GetFootPos()
+        dim = GetComponent("Dimension", entityId).GetEntityDimensionId()
+        item_entity_pos = GetComponent("Pos", entityId).GetFootPos()
         entityId_block_pos = get_block_pos(item_entity_pos)
         block = self.block_info_comp.GetBlockNew(entityId_block_pos, dimensionId=dim)
+        support = None  # 下方的方块，落在耕地上时已知，否则在确认能种植后读取
         
         if block:
             # 如果落在耕地上，则尝试在耕地上一格种植
             if block["name"] == "minecraft:farmland":
+                support = block
                 entityId_block_pos = entityId_block_pos[0], entityId_block_pos[1] + 1, entityId_block_pos[2]
                 block = self.block_info_comp.GetBlockNew(entityId_block_pos, dimensionId=dim)
                 if not block:
-                    return
+                    return False
             # 只能种植在空气或水中
             if block["name"] not in {"minecraft:air", "minecraft:water", "minecraft:flowing_water"}:
-                return
+                return False
 
-        itemName = event["itemName"]
-        auxValue = event["auxValue"]
-        item_key = itemName, auxValue
-        if item_key in special_saplings:  # 处理特殊树苗映射
-            itemName, auxValue = special_saplings[item_key]
-            
-        # 检查是否可以放置
-        result = compFactory.CreateItem(playerId).MayPlaceOn(itemName, auxValue, entityId_block_pos, Facing.Up)
-        if not result and auxValue == 0:
-            result = self.block_info_comp.MayPlace(itemName, entityId_block_pos, Facing.Up, dimensionId=dim)
+        itemName, auxValue = block_key  # 种植后对应的方块
+
+        key = (dim,) + entityId_block_pos
+        if key in self.planting_queue:
+            # 同一位置只能种一棵，后来的树苗保留为掉落物
+            return False
+        target_name = block["name"] if block else "minecraft:air"
+        if support is None:
+            support = self.block_info_comp.GetBlockNew((entityId_block_pos[0], entityId_block_pos[1] - 1, entityId_block_pos[2]), dimensionId=dim)
+        # 排队期间方块可能被修改，种植前会重新读取并与这里记录的方块比较
+        self.planting_queue[key] = entityId, itemName, auxValue, playerId, item_entity_pos, target_name, support
+        self.update_planting_backpressure()
+        return True
+
+    def drain_planting_queue(self, count):
+        """
+        从种植队列头部取出最多count个树苗进行种植。
+
+        :param count: int, 本次最多种植的数量
+        """
+        queue = self.planting_queue
+        for _ in range(min(count, len(queue))):
+            key, value = queue.popitem(last=False)
+            self.place_sapling(key[0], key[1:], *value)
+        self.update_planting_backpressure()
+
+    def update_planting_backpressure(self):
+        """
+        种植队列超过高水位时，向客户端广播更长的落地等待时间以减缓通知速度，回落到低水位后恢复。
+        服务端检测模式下的落地等待时间见on_entity_on_ground。
+        """
+        size = len(self.planting_queue)
+        master_setting = self.master_setting
+        if not self.planting_backpressure and size >= master_setting.planting_queue_high:
+            self.planting_backpressure = True
+            self.sync_master_setting({"min_wait_time": master_setting.min_wait_time + master_setting.backpressure_wait_time})
+        elif self.planting_backpressure and size <= master_setting.planting_queue_low:
+            self.planting_backpressure = False
+            self.sync_master_setting({"min_wait_time": master_setting.min_wait_time})
+
+    def place_sapling(self, dim, entityId_block_pos, entityId, itemName, auxValue, playerId, item_entity_pos, target_name, support):
+        """
+        将树苗掉落物种植为方块，由种植队列调用。
+        种植坐标和下方的方块在排队期间发生变化（例如玩家放置了方块）时放弃种植。
+
+        :param dim: int, 维度ID
+        :param entityId_block_pos: tuple, 种植坐标
+        :param entityId: str, 掉落物实体ID
+        :param itemName: str, 要放置的方块ID
+        :param auxValue: int, 要放置的方块附加值
+        :param playerId: str, 用于检查能否放置的玩家，为None时只使用MayPlace检查
+        :param item_entity_pos: tuple, 掉落物坐标，用于生成剩余的掉落物
+        :param target_name: str, 加入队列时种植坐标处的方块ID
+        :param support: dict/None, 加入队列时下方的方块
+        """
+        if not self.game_comp.IsEntityAlive(entityId):
+            return  # 排队期间可能已经被捡起或消失
+
+        get_block = self.block_info_comp.GetBlockNew
+        target = get_block(entityId_block_pos, dimensionId=dim)
+        current_support = get_block((entityId_block_pos[0], entityId_block_pos[1] - 1, entityId_block_pos[2]), dimensionId=dim)
+        if not target or target["name"] != target_name or not support or not current_support or \
+                current_support["name"] != support["name"] or current_support["aux"] != support["aux"]:
+            self.retry_tracked_sapling(entityId)
+            return
+        # 缓存键只使用刚读取的方块；依赖周围方块的种植物每次都重新检查
+        if itemName not in NEIGHBOUR_DEPENDENT_BLOCKS:
+            cache_key = itemName, auxValue, current_support["name"], current_support["aux"], target["name"], target["aux"]
+            result = self.may_place_cache.get(cache_key)
+        else:
+            cache_key = result = None
+        if result is None:
+            result = self.may_place(dim, entityId_block_pos, itemName, auxValue, playerId)
+            if cache_key is not None:
+                self.may_place_cache.put(cache_key, result)
         
         if result:
             item = self.item_comp.GetDroppedItem(entityId, getUserData=True)
@@ -186,22 +623,120 @@ class SaplantingServer(BaseServerSystem):
                 self.DestroyEntity(entityId)
                 self.block_info_comp.SetBlockNew(entityId_block_pos, {"name": itemName, "aux": auxValue}, dimensionId=dim)
                 self.CreateEngineItemEntity(item, dimensionId=dim, pos=item_entity_pos)
+        else:
+            self.retry_tracked_sapling(entityId)
+
+    def may_place(self, dim, pos, itemName, auxValue, playerId):
+        """
+        检查树苗能否放置在指定坐标。
+        MayPlaceOn按玩家所在的维度检查，玩家不在该维度时只使用按维度检查的MayPlace。
+
+        :return: bool, 能否放置
+        """
+        result = False
+        if playerId is not None and GetComponent("Dimension", playerId).GetEntityDimensionId() == dim:
+            result = GetComponent("Item", playerId).MayPlaceOn(itemName, auxValue, pos, Facing.Up)
+        if not result:
+            result = self.block_info_comp.MayPlace(itemName, pos, Facing.Up, dimensionId=dim)
+        return bool(result)
 
-    def add_vein(self, playerId, affected_list):
+    def add_vein(self, playerId, affected_list, finish=True, dimensionId=None, fullName=None):
         """
         执行连锁砍树的方块破坏。
-        
+        一次连锁会被FellingJob拆分为多批调用。
+
         :param playerId: str, 玩家ID
-        :param affected_list: list, 需要被破坏的方块坐标列表
+        :param affected_list: list, 本批需要被破坏的方块坐标列表
+        :param finish: bool, 是否为该次连锁的最后一批
+        :param dimensionId: int, 维度ID，与fullName一起给出时，破坏前重新读取方块
+        :param fullName: str, 木头方块ID，任务跨越多个tick，只破坏仍然是该木头的方块
         """
+        if fullName is not None:
+            if GetComponent("Dimension", playerId).GetEntityDimensionId() != dimensionId:
+                return  # 玩家已离开该维度，PlayerDestoryBlock会作用在玩家所在的维度
+            get_block = self.block_info_comp.GetBlockNew
+            affected_list = [pos for pos in affected_list if (get_block(pos, dimensionId) or {}).get("name") == fullName]
         if affected_list:
-            self.player_destroying[playerId].update(affected_list)
-            player_block_info_comp = compFactory.CreateBlockInfo(playerId)
-            # 逐个破坏方块，最后一个方块才掉落物品，以模拟连锁效果
-            for pos in affected_list[:-1]:
-                player_block_info_comp.PlayerDestoryBlock(pos, 0, False)
-            player_block_info_comp.PlayerDestoryBlock(affected_list[-1], 0, True)
-            self.player_destroying[playerId].clear()
+            destroying = self.player_destroying[playerId]
+            destroying.update(affected_list)
+            player_block_info_comp = GetComponent("BlockInfo", playerId)
+            if finish:
+                # 逐个破坏方块，最后一个方块才掉落物品，以模拟连锁效果
+                for pos in affected_list[:-1]:
+                    player_block_info_comp.PlayerDestoryBlock(pos, 0, False)
+                player_block_info_comp.PlayerDestoryBlock(affected_list[-1], 0, True)
+            else:
+                for pos in affected_list:
+                    player_block_info_comp.PlayerDestoryBlock(pos, 0, False)
+            destroying.difference_update(affected_list)
+
+    def remove_vein(self, playerId, dimensionId, fullName, affected_list, loot):
+        """
+        合并掉落模式下的连锁破坏。
+        与普通连锁一样以玩家身份破坏方块，领地保护等模组可以取消破坏，手持工具的耐久也由引擎扣除；
+        掉落自身的木头取消原版掉落物并累计数量，其余方块按原版规则掉落。
+        任务跨越多个tick，方块可能已被其他玩家替换，因此破坏前会重新读取方块，只破坏仍然是该木头的方块。
+
+        :param playerId: str, 玩家ID
+        :param dimensionId: int, 维度ID
+        :param fullName: str, 木头方块ID
+        :param affected_list: list, 本批需要被破坏的方块坐标列表
+        :param loot: dict, 累计掉落物数量的字典，{(物品ID, 附加值): 数量}
+        """
+        if GetComponent("Dimension", playerId).GetEntityDimensionId() != dimensionId:
+            return  # 玩家已离开该维度，PlayerDestoryBlock会作用在玩家所在的维度
+        destroying = self.player_destroying[playerId]
+        merging = self.merging_drops
+        mergeable = fullName in SELF_DROP_LOG_BLOCKS
+        player_block_info_comp = GetComponent("BlockInfo", playerId)
+        if mergeable:
+            self.set_method_listening(self.on_player_try_destroy_block, True)
+        for pos in affected_list:
+            block = self.block_info_comp.GetBlockNew(pos, dimensionId)
+            if block and block["name"] == fullName:
+                key = playerId, pos
+                if mergeable:
+                    merging.add(key)
+                destroying.add(pos)
+                if player_block_info_comp.PlayerDestoryBlock(pos, 0, False):
+                    if mergeable:
+                        item_key = GetLogDropItem(block["name"], block["aux"])
+                        loot[item_key] = loot.get(item_key, 0) + 1
+                else:
+                    merging.discard(key)
+                destroying.discard(pos)
+        if not merging:
+            self.set_method_listening(self.on_player_try_destroy_block, False)
+
+    @Listen.on("ServerPlayerTryDestroyBlockEvent", lazy=True)
+    def on_player_try_destroy_block(self, event):
+        """
+        合并掉落模式下以玩家身份破坏木头时，取消原版掉落物，改由give_vein_loot统一发放。
+        只在remove_vein破坏方块期间注册。
+        """
+        key = event["playerId"], (event["x"], event["y"], event["z"])
+        if key in self.merging_drops:
+            self.merging_drops.discard(key)
+            event["spawnResources"] = False
+            if not self.merging_drops:
+                self.set_method_listening(self.on_player_try_destroy_block, False)
+
+    def give_vein_loot(self, playerId, dimensionId, pos, loot):
+        """
+        合并掉落模式下，连锁结束后统一发放掉落物。斧头耐久在破坏时已由引擎扣除。
+        相同的物品合并为整组，放入玩家背包或在被砍的方块处生成。
+
+        :param playerId: str, 玩家ID
+        :param dimensionId: int, 维度ID
+        :param pos: tuple, 玩家破坏的方块坐标
+        :param loot: dict, 掉落物数量，{(物品ID, 附加值): 数量}
+        """
+        for (itemName, auxValue), count in loot.items():
+            spawnitem = {"newItemName": itemName, "newAuxValue": auxValue, "count": count}
+            if self.master_setting.tree_felling_drops_to_inventory:
+                AddItemToPlayerInventory(playerId, spawnitem)
+            else:
+                SpawnItemStacksToLevel(spawnitem, dimensionId, (pos[0] + 0.5, pos[1] + 0.5, pos[2] + 0.5))
 
     @staticmethod
     def get_tree_type(state, fullName):
@@ -212,10 +747,12 @@ class SaplantingServer(BaseServerSystem):
             return state["new_log_type"]
         return fullName
 
-    @Listen.on("DestroyBlockEvent")
+    @Listen.on("DestroyBlockEvent", lazy=True)
     def on_player_destroy_block(self, event):
         """
         监听玩家破坏方块事件，用于实现连锁砍树。
+        这里只做判断并创建任务，搜索和破坏由felling_scheduler在之后的tick中分批完成。
+        只在有玩家开启连锁砍树且手持斧头时注册，参考update_felling_listen。
         """
         if not self.master_setting.tree_felling or self.master_setting.tree_felling_limit_count <= 0:
             return
@@ -236,50 +773,29 @@ class SaplantingServer(BaseServerSystem):
         if not state:
             return
             
-        # 检查玩家是否手持斧头
-        handItem = compFactory.CreateItem(playerId).GetPlayerItem(ItemPosType.CARRIED)
-        if not handItem or not isAxe(handItem["newItemName"], handItem["newAuxValue"]):
+        # 检查玩家是否手持斧头（由手持物品缓存维护）
+        if playerId not in self.player_holding_axe:
             return
             
         dimensionId = event["dimensionId"]
+        # 玩家放置的木头，属于建筑
+        if self.placed_logs.was_placed(dimensionId, pos):
+            return
+        # 该方块已经在玩家某个进行中的任务里，不再重复搜索
+        if self.felling_scheduler.is_pending(playerId, dimensionId, pos):
+            return
         oldBlockState = self.block_state_comp.GetBlockStatesFromAuxValue(fullName, event["auxData"])
         tree_type = self.get_tree_type(oldBlockState, fullName)
+        # 该方块属于最近被判定为建筑的结构，不再搜索
+        if self.master_setting.check_leave_persistent_bit and self.tree_cache.lookup(dimensionId, pos, fullName, tree_type):
+            return
 
-        # 使用广度优先搜索（BFS）寻找所有相连的同种木头
-        searched = set()
-        affected = []
-        queue = [pos]
-        found_one_with_leaves = not self.master_setting.check_leave_persistent_bit
-        
-        while queue:
-            start_pos = queue.pop()
-            for offset in BLOCKSURROUNDINGS: # 遍历周围26个方块
-                search_pos = start_pos[0] + offset[0], start_pos[1] + offset[1], start_pos[2] + offset[2]
-                if search_pos in searched:
-                    continue
-                searched.add(search_pos)
-                block = self.block_info_comp.GetBlockNew(search_pos, dimensionId)
-                if not block:
-                    continue
-                
-                # 如果是同种木头，加入待破坏列表
-                if block["name"] == fullName:
-                    state = self.block_state_comp.GetBlockStates(search_pos, dimensionId)
-                    if not state or self.get_tree_type(state, block["name"]) == tree_type:
-                        affected.append(search_pos)
-                        queue.append(search_pos)
-                        # 达到数量上限
-                        if len(affected) >= self.master_setting.tree_felling_limit_count:
-                            if not found_one_with_leaves:
-                                return # 没有发现天然树叶，判定为人工建筑，不砍
-                            else:
-                                self.add_vein(playerId, affected)
-                                return
-                # 检查附近是否有天然树叶（persistent_bit为false），作为是“树”而非“建筑”的判断依据
-                elif not found_one_with_leaves and block["name"] in LEAVE_BLOCKS:
-                    state = self.block_state_comp.GetBlockStates(search_pos, dimensionId)
-                    if state and "persistent_bit" in state and not state["persistent_bit"]:
-                        found_one_with_leaves = True
-                        
-        if found_one_with_leaves:
-            self.add_vein(playerId, affected)
+        self.felling_scheduler.add(FellingJob(
+            playerId, dimensionId, pos, fullName, tree_type,
+            self.master_setting.tree_felling_limit_count,
+            check_leaves=self.master_setting.check_leave_persistent_bit,
+            merge_drops=self.master_setting.tree_felling_merge_drops,
+            placed_logs=self.placed_logs if self.placed_logs.chunks else None,
+            max_radius=self.master_setting.tree_felling_max_radius,
+            max_height=self.master_setting.tree_felling_max_height
+        ))
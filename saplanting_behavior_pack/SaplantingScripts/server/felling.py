@@ -0,0 +1,516 @@
+# -*- coding: utf-8 -*-
+"""
+连锁砍树的任务与调度。
+原先的搜索与破坏都在一次DestroyBlockEvent回调中同步完成，大树会造成明显的tick卡顿。
+这里将一次连锁拆分为可恢复的任务（FellingJob），由FellingScheduler在OnScriptTickServer中按方块预算逐步推进。
+本模块不直接依赖引擎接口，所有引擎调用都通过传入的System完成。
+"""
+from ..config.sapling import BLOCKSURROUNDINGS, BUILDING_BLOCK_KEYWORDS, TREE_SPECIES, DEFAULT_TREE_SPECIES, TREE_TYPE_SPECIES, LEAF_TYPE_STATES
+
+
+def get_probe_offsets(kernel):
+    """
+    预判时在木头柱顶端探测天然树叶的偏移量。
+    只探测与顶端木头相邻（在搜索邻域内）的方块，与搜索时的树叶检查一致，旁边另一棵树的树叶不会被误认；
+    按距离由近到远排列，上方一层优先。
+
+    :param kernel: list, 树种的搜索邻域偏移量
+    :return: list, [(dx, dy, dz), ...]
+    """
+    return sorted(kernel, key=lambda offset: (abs(offset[0]) + abs(offset[2]), offset[1] != 1))
+
+
+# 预判结果
+PROBE_TREE = "tree"
+PROBE_NOT_TREE = "not_tree"
+PROBE_UNKNOWN = "unknown"
+
+# 方块状态只取决于方块ID和附加值，全局缓存，避免按坐标反复查询方块状态
+cachedBlockStates = {}
+
+_MISSING = object()
+
+
+def get_species(tree_type):
+    """
+    获取树木类型对应的树种参数，未注册的类型使用默认参数。
+
+    :param tree_type: str, 树木类型，见SaplantingServer.get_tree_type
+    :return: dict, 参考config.sapling.TREE_SPECIES
+    """
+    species = TREE_TYPE_SPECIES.get(tree_type)
+    return TREE_SPECIES[species] if species else DEFAULT_TREE_SPECIES
+
+
+class BlockVolumeSnapshot(object):
+    """
+    一次连锁砍树期间的方块快照。
+    缓存一个维度内每个坐标的方块名称、附加值和状态，同一坐标在一次连锁中最多只向引擎查询一次。
+    一次连锁只涉及一个维度，因此直接以(x, y, z)作为键，等价于按(维度, x, y, z)缓存。
+    快照只用于预判和搜索阶段：破坏阶段在之后的tick中进行，方块可能已被修改，
+    add_vein/remove_vein会为每个要破坏的木头重新读取一次，因此被破坏的木头最多有两次引擎查询。
+    """
+
+    def __init__(self, block_info_comp, block_state_comp, dimensionId):
+        """
+        :param block_info_comp: 服务端BlockInfo组件
+        :param block_state_comp: 服务端BlockState组件
+        :param dimensionId: int, 快照所在的维度
+        """
+        self.block_info_comp = block_info_comp
+        self.block_state_comp = block_state_comp
+        self.dimensionId = dimensionId
+        self.blocks = {}  # type: dict[tuple, dict]
+        self.hits = 0  # 命中快照的查询次数
+        self.misses = 0  # 需要访问引擎的查询次数
+
+    def __len__(self):
+        return len(self.blocks)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def get_block(self, pos):
+        """
+        获取方块的名称与附加值。
+
+        :param pos: tuple, 方块坐标
+        :return: dict/None, 格式同GetBlockNew的返回值
+        """
+        block = self.blocks.get(pos, _MISSING)
+        if block is not _MISSING:
+            self.hits += 1
+            return block
+        self.misses += 1
+        block = self.blocks[pos] = self.block_info_comp.GetBlockNew(pos, self.dimensionId)
+        return block
+
+    def get_states(self, pos):
+        """
+        获取方块状态，由快照中的方块名称和附加值换算得到，不会再按坐标访问引擎。
+
+        :param pos: tuple, 方块坐标
+        :return: dict/None, 方块状态字典
+        """
+        block = self.get_block(pos)
+        if not block:
+            return None
+        state_key = block["name"], block["aux"]
+        if state_key not in cachedBlockStates:
+            cachedBlockStates[state_key] = self.block_state_comp.GetBlockStatesFromAuxValue(*state_key)
+        return cachedBlockStates[state_key]
+
+
+class SearchBox(object):
+    """
+    以搜索起点为中心的有界搜索空间。
+    坐标按相对起点的偏移打包为一个整数，已搜索标记保存在bytearray中，
+    邻居坐标通过预先计算的整数偏移得到，已搜索的邻居只需一次整数加法和一次下标访问即可跳过，
+    只有真正需要读取的方块才会构造坐标元组。
+    空间外围有一圈预先标记为已搜索的边界，因此不需要单独做越界判断。
+    """
+    templates = {}
+    """按(radius, height, depth)缓存已标记好边界的bytearray模板，新建搜索空间时直接复制"""
+
+    def __init__(self, origin, radius, height, depth=0, offsets=BLOCKSURROUNDINGS):
+        """
+        :param origin: tuple, 起点坐标
+        :param radius: int, 最大水平半径
+        :param height: int, 起点上方的最大高度
+        :param depth: int, 起点下方的最大深度
+        :param offsets: list, 邻居偏移量，每个分量只能是-1、0或1
+        """
+        self.radius = radius
+        self.height = height
+        self.depth = depth
+        self.size_z = size_z = 2 * radius + 3
+        self.size_y = size_y = height + depth + 3
+        self.size_yz = size_y * size_z
+        # 打包坐标0对应的世界坐标
+        self.base = origin[0] - radius - 1, origin[1] - depth - 1, origin[2] - radius - 1
+        # 每个邻居的(打包偏移, dx, dy, dz)
+        self.kernel = [((dx * size_y + dy) * size_z + dz, dx, dy, dz) for dx, dy, dz in offsets]
+        # 邻居只向同层和上方扩展时，底面不会截断搜索
+        self.reaches_down = any(dy < 0 for _, dy, _ in offsets)
+        self.visited = bytearray(self.get_template(radius, height, depth))
+        self.origin = self.pack(origin)
+
+    @classmethod
+    def get_template(cls, radius, height, depth):
+        """获取边界已标记为已搜索的模板"""
+        key = radius, height, depth
+        if key not in cls.templates:
+            size_x = size_z = 2 * radius + 3
+            size_y = height + depth + 3
+            size_yz = size_y * size_z
+            template = bytearray(size_x * size_yz)
+            edge = bytearray(b"\x01") * size_yz
+            template[0:size_yz] = edge
+            template[(size_x - 1) * size_yz:] = edge
+            row = bytearray(b"\x01") * size_z
+            for x in range(1, size_x - 1):
+                start = x * size_yz
+                template[start:start + size_z] = row
+                template[start + size_yz - size_z:start + size_yz] = row
+                for y in range(1, size_y - 1):
+                    template[start + y * size_z] = 1
+                    template[start + y * size_z + size_z - 1] = 1
+            cls.templates[key] = template
+        return cls.templates[key]
+
+    def pack(self, pos):
+        """
+        将世界坐标打包为整数。
+
+        :return: int/None, 坐标不在搜索空间内时返回None
+        """
+        x = pos[0] - self.base[0]
+        y = pos[1] - self.base[1]
+        z = pos[2] - self.base[2]
+        if 0 < x < self.size_z - 1 and 0 < y < self.size_y - 1 and 0 < z < self.size_z - 1:
+            return (x * self.size_y + y) * self.size_z + z
+        return None
+
+    def on_edge(self, index):
+        """
+        打包坐标是否位于搜索空间的最外层，从这里继续扩展就会越过边界，搜索结果因此可能不完整。
+        """
+        x, rest = divmod(index, self.size_yz)
+        y, z = divmod(rest, self.size_z)
+        last = self.size_z - 2
+        return x == 1 or x == last or z == 1 or z == last or y == self.size_y - 2 or (y == 1 and self.reaches_down)
+
+    def unpack(self, index):
+        """将打包的整数还原为世界坐标"""
+        x, rest = divmod(index, self.size_yz)
+        y, z = divmod(rest, self.size_z)
+        return self.base[0] + x, self.base[1] + y, self.base[2] + z
+
+    def __contains__(self, pos):
+        """坐标是否已被搜索过"""
+        index = self.pack(pos)
+        return index is not None and self.visited[index] == 1
+
+
+class FellingJob(object):
+    """
+    一次连锁砍树任务，分为“搜索”和“破坏”两个阶段，每个阶段都可以在任意位置暂停并在下一个tick继续。
+    需要检查天然树叶时，搜索前先做一次预判（probe）。
+    """
+    PROBING = -1
+    """预判是树还是建筑"""
+    SEARCHING = 0
+    """搜索相连的木头"""
+    DESTROYING = 1
+    """逐批破坏搜索到的木头"""
+    FINISHED = 2
+    """任务结束（已砍完或判定为建筑）"""
+
+    def __init__(self, playerId, dimensionId, pos, fullName, tree_type, limit, check_leaves=True, merge_drops=False, placed_logs=None, species=None, max_radius=None, max_height=None):
+        """
+        :param playerId: str, 砍树的玩家ID
+        :param dimensionId: int, 维度ID
+        :param pos: tuple, 被玩家破坏的木头坐标，作为搜索起点
+        :param fullName: str, 木头方块ID
+        :param tree_type: str, 树木类型，见SaplantingServer.get_tree_type
+        :param limit: int, 一次最多破坏的方块数
+        :param check_leaves: bool, 是否需要找到天然树叶才执行砍伐
+        :param merge_drops: bool, 是否合并掉落物，砍完后统一生成
+        :param placed_logs: PlacedLogIndex, 玩家放置的木头索引，其中的木头不会被搜索和破坏，为None时不检查
+        :param species: dict, 树种参数，为None时按tree_type获取
+        :param max_radius: int, 搜索的最大水平半径，为None时只受树种限制
+        :param max_height: int, 搜索在起点上方（和下方）的最大高度，为None时只受树种限制
+        """
+        self.playerId = playerId
+        self.dimensionId = dimensionId
+        self.fullName = fullName
+        self.tree_type = tree_type
+        self.limit = limit
+        self.found_one_with_leaves = not check_leaves
+        self.capped = False  # 搜索是否不完整：达到数量上限，或有木头位于搜索空间边缘
+        self.origin = pos
+        self.species = species = species or get_species(tree_type)
+        self.leaves = species["leaves"]
+        self.leaf_type = species.get("leaf_type")
+        self.markers = species["markers"]
+        # 一次连锁最多破坏limit个方块，相连的木头不可能离起点更远，据此和树种的生长范围确定搜索空间大小，
+        # 再用配置的上限截断。搜索空间外的坐标在读取方块之前就被边界跳过，最坏情况下的读取次数因此有上界
+        radius = min(limit + 1, species["radius"])
+        height = min(limit + 1, species["height"])
+        depth = min(limit + 1, species["depth"])
+        if max_radius is not None:
+            radius = min(radius, max_radius)
+        if max_height is not None:
+            height = min(height, max_height)
+            depth = min(depth, max_height)
+        self.box = SearchBox(pos, radius, height, depth, offsets=species["kernel"])
+        # 深度优先搜索中后入栈的邻居先展开，把向上的邻居排在最后，优先向树冠方向搜索，尽早遇到树叶
+        self.box.kernel.sort(key=lambda neighbour: neighbour[2])
+        self.verdict = None  # 预判结果，不需要检查树叶时为None
+        self.affected = []
+        self.queue = [self.box.origin]
+        self.index = 0  # 破坏阶段的进度
+        self.phase = self.PROBING if check_leaves else self.SEARCHING
+        self.snapshot = None  # type: BlockVolumeSnapshot
+        # 合并掉落模式下累计的掉落物，{(物品ID, 附加值): 数量}
+        self.loot = {} if merge_drops else None  # type: dict[tuple[str, int], int]
+        self.placed_logs = placed_logs
+
+    @property
+    def finished(self):
+        return self.phase == self.FINISHED
+
+    def step(self, system, budget):
+        """
+        推进任务。
+
+        :param system: SaplantingServer, 提供引擎组件和破坏方法的System
+        :param budget: int, 本次最多处理的方块数
+        :return: int, 实际处理的方块数
+        """
+        if self.snapshot is None:
+            self.snapshot = BlockVolumeSnapshot(system.block_info_comp, system.block_state_comp, self.dimensionId)
+        if self.phase == self.PROBING:
+            used = self.probe(system)
+            if self.phase != self.SEARCHING or used >= budget:
+                return used
+            return used + self.search(system, budget - used)
+        if self.phase == self.SEARCHING:
+            return self.search(system, budget)
+        elif self.phase == self.DESTROYING:
+            return self.destroy(system, budget)
+        return 0
+
+    def is_natural_leaves(self, pos):
+        """
+        坐标处是否为该树种天然生成的树叶（或菌块等标志方块）。
+        旧版树叶的多个树种共用一个方块ID，按old_leaf_type/new_leaf_type状态区分。
+        """
+        block = self.snapshot.get_block(pos)
+        if not block:
+            return False
+        if block["name"] in self.leaves:
+            state = self.snapshot.get_states(pos)
+            if not state or "persistent_bit" not in state or state["persistent_bit"]:
+                return False
+            if self.leaf_type is not None:
+                for key in LEAF_TYPE_STATES:
+                    if key in state:
+                        return state[key] == self.leaf_type
+            return True
+        return block["name"] in self.markers
+
+    def probe(self, system):
+        """
+        搜索前的预判，只读取几十个方块：
+        从被破坏的方块沿木头柱向上爬到顶端，
+        顶端被建筑方块覆盖时判定为建筑（NOT_TREE），不再搜索；
+        与顶端木头相邻的方块中找到天然树叶时判定为树（TREE），之后的搜索不再检查树叶；
+        否则无法判断（UNKNOWN），按原方式完整搜索。
+
+        :return: int, 读取的方块数
+        """
+        snapshot = self.snapshot
+        x, y, z = self.origin
+        top = y + self.box.height
+        used = 0
+        while y < top:
+            used += 1
+            block = snapshot.get_block((x, y + 1, z))
+            if not block or block["name"] != self.fullName:
+                break
+            y += 1
+        # 覆盖在木头柱顶端的方块
+        used += 1
+        cover = snapshot.get_block((x, y + 1, z))
+        if cover and any(keyword in cover["name"] for keyword in BUILDING_BLOCK_KEYWORDS):
+            self.verdict = PROBE_NOT_TREE
+            self.finish_search()
+            return used
+        for dx, dy, dz in get_probe_offsets(self.species["kernel"]):
+            used += 1
+            if self.is_natural_leaves((x + dx, y + dy, z + dz)):
+                self.verdict = PROBE_TREE
+                self.found_one_with_leaves = True
+                break
+        else:
+            self.verdict = PROBE_UNKNOWN
+        self.phase = self.SEARCHING
+        return used
+
+    def search(self, system, budget):
+        """
+        深度优先搜索所有相连的同种木头，每读取一个方块消耗一点预算。
+        一个方块的周围方块会在同一次调用中读完，因此实际消耗可能略微超出预算。
+        预判已确认是树时跳过树叶检查。
+        """
+        used = 0
+        snapshot = self.snapshot
+        affected = self.affected
+        queue = self.queue
+        box = self.box
+        visited = box.visited
+        kernel = box.kernel
+        placed_logs = self.placed_logs
+        dimensionId = self.dimensionId
+        while queue and used < budget:
+            start = queue.pop()
+            start_x, start_y, start_z = box.unpack(start)
+            for delta, dx, dy, dz in kernel:
+                index = start + delta
+                if visited[index]:
+                    continue
+                visited[index] = 1
+                used += 1
+                search_pos = start_x + dx, start_y + dy, start_z + dz
+                block = snapshot.get_block(search_pos)
+                if not block:
+                    continue
+                # 如果是同种木头，加入待破坏列表
+                if block["name"] == self.fullName:
+                    if placed_logs is not None and placed_logs.contains(dimensionId, search_pos):
+                        continue  # 玩家放置的木头，不属于树
+                    state = snapshot.get_states(search_pos)
+                    if not state or system.get_tree_type(state, block["name"]) == self.tree_type:
+                        affected.append(search_pos)
+                        queue.append(index)
+                        # 相连的木头可能延伸到搜索空间之外，结果不能作为完整的结构缓存
+                        if not self.capped and box.on_edge(index):
+                            self.capped = True
+                        # 达到数量上限
+                        if len(affected) >= self.limit:
+                            self.capped = True
+                            self.finish_search()
+                            return used
+                # 检查附近是否有天然树叶（persistent_bit为false），作为是“树”而非“建筑”的判断依据
+                elif not self.found_one_with_leaves and (block["name"] in self.leaves or block["name"] in self.markers):
+                    self.found_one_with_leaves = self.is_natural_leaves(search_pos)
+        if not queue:
+            self.finish_search()
+        return used
+
+    def finish_search(self):
+        """搜索结束，没有发现天然树叶时判定为人工建筑，不砍"""
+        self.queue = []
+        if self.found_one_with_leaves and self.affected:
+            self.phase = self.DESTROYING
+        else:
+            self.phase = self.FINISHED
+
+    def destroy(self, system, budget):
+        """按预算逐批破坏搜索到的木头"""
+        batch = self.affected[self.index:self.index + max(1, budget)]
+        self.index += len(batch)
+        done = self.index >= len(self.affected)
+        if self.loot is None:
+            system.add_vein(self.playerId, batch, finish=done, dimensionId=self.dimensionId, fullName=self.fullName)
+        else:
+            system.remove_vein(self.playerId, self.dimensionId, self.fullName, batch, self.loot)
+        if self.phase == self.FINISHED:
+            return len(batch)  # 破坏期间任务被取消，掉落物已在取消时处理
+        if done:
+            self.phase = self.FINISHED
+            if self.loot:
+                system.give_vein_loot(self.playerId, self.dimensionId, self.origin, self.loot)
+        return len(batch)
+
+    def cancel(self, system, give_loot=False):
+        """
+        取消任务，剩余的木头不再破坏。
+
+        :param system: SaplantingServer, 用于发放掉落物的System
+        :param give_loot: bool, 是否发放合并掉落模式下已破坏的木头累计的掉落物
+        """
+        self.phase = self.FINISHED
+        if give_loot and self.loot:
+            system.give_vein_loot(self.playerId, self.dimensionId, self.origin, self.loot)
+        self.loot = {} if self.loot is not None else None
+
+    @property
+    def rejected(self):
+        """搜索已完成，但没有发现天然树叶，判定为人工建筑"""
+        return self.phase == self.FINISHED and not self.found_one_with_leaves
+
+    def __contains__(self, pos):
+        """坐标是否已被本任务搜索过"""
+        return pos in self.box
+
+
+class FellingScheduler(object):
+    """
+    连锁砍树任务调度器。
+    每个tick把方块预算平均分给所有进行中的任务，多名玩家同时砍大树时总开销仍然受预算限制。
+    """
+
+    def __init__(self, system, tree_cache=None):
+        """
+        :param system: SaplantingServer, 任务执行时使用的System
+        :param tree_cache: TreeStructureCache, 记录被判定为建筑的木头结构，为None时不记录
+        """
+        self.system = system
+        self.tree_cache = tree_cache
+        self.jobs = []  # type: list[FellingJob]
+        # 统计数据，用于观察快照的命中率
+        self.stats = {"jobs": 0, "felled": 0, "hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job):
+        """添加一个新的连锁砍树任务"""
+        self.jobs.append(job)
+        self.stats["jobs"] += 1
+
+    def cancel(self, playerId, give_loot=False):
+        """
+        取消某个玩家的所有任务，通常在玩家离开、不再手持斧头或关闭连锁砍树时调用。
+
+        :param playerId: str, 玩家ID
+        :param give_loot: bool, 是否发放合并掉落模式下已破坏的木头累计的掉落物
+        """
+        for job in self.jobs:
+            if job.playerId == playerId:
+                job.cancel(self.system, give_loot)
+        self.jobs = [job for job in self.jobs if job.playerId != playerId]
+
+    def is_pending(self, playerId, dimensionId, pos):
+        """判断坐标是否已经属于该玩家某个进行中的任务，避免同一棵树被重复搜索"""
+        for job in self.jobs:
+            if job.playerId == playerId and job.dimensionId == dimensionId and pos in job:
+                return True
+        return False
+
+    def tick(self, budget):
+        """
+        推进所有任务。
+
+        :param budget: int, 本tick所有任务合计最多处理的方块数
+        """
+        if not self.jobs:
+            return
+        share = max(1, budget // len(self.jobs))
+        finished = False
+        for job in self.jobs:
+            job.step(self.system, share)
+            if job.finished:
+                finished = True
+                self.record(job)
+        if finished:
+            self.jobs = [job for job in self.jobs if not job.finished]
+
+    def record(self, job):
+        """记录已完成任务的统计数据，完整搜索后被判定为建筑的结构写入缓存"""
+        self.stats["felled"] += job.index
+        # 只缓存完整搜索得出的结论，预判为建筑的结构没有搜索过，成员未知
+        if self.tree_cache is not None and job.rejected and not job.capped and job.verdict != PROBE_NOT_TREE:
+            self.tree_cache.put(job.dimensionId, job.affected + [job.origin], job.fullName, job.tree_type)
+        if job.snapshot is not None:
+            self.stats["hits"] += job.snapshot.hits
+            self.stats["misses"] += job.snapshot.misses
+
+    def get_hit_rate(self):
+        """所有已完成任务的快照命中率"""
+        total = self.stats["hits"] + self.stats["misses"]
+        return float(self.stats["hits"]) / total if total else 0.0
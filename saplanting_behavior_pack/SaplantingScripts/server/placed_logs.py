@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+玩家放置的木头索引。
+按区块记录玩家放置的木头坐标，保存在存档的附加数据中，区块加载时读取、卸载时写回。
+连锁砍树时，玩家放置的木头直接视为建筑，不需要搜索树叶来判断。
+"""
+from ..util.common import ExpiringTable
+
+
+class PlacedLogIndex(object):
+    """
+    玩家放置的木头索引。
+    每个区块的坐标打包为整数集合：((y + 64) << 8) | (区块内x << 4) | 区块内z。
+    只有存有数据的区块才会在加载时读取附加数据，这些区块的列表单独保存在一个键中。
+    """
+
+    def __init__(self, extra_data_comp, prefix):
+        """
+        :param extra_data_comp: 存档（Level）的ExtraData组件
+        :param prefix: str, 附加数据的键名前缀
+        """
+        self.extra_data_comp = extra_data_comp
+        self.prefix = prefix
+        self.chunks = {}  # type: dict[tuple[int,int,int], set[int]]
+        self.dirty = set()  # 有未写回修改的区块
+        stored = extra_data_comp.GetExtraData(prefix)
+        self.stored = set(tuple(key) for key in stored) if stored else set()  # 附加数据中存有索引的区块
+        # 破坏方块时，方块移除事件可能早于破坏事件触发，短时间内保留已移除的坐标
+        self.recently_removed = ExpiringTable(ttl=5)
+
+    @staticmethod
+    def locate(dimensionId, pos):
+        """
+        :return: tuple, (区块键, 打包后的坐标)
+        """
+        x, y, z = pos
+        return (dimensionId, x >> 4, z >> 4), ((y + 64) << 8) | ((x & 15) << 4) | (z & 15)
+
+    def get_data_key(self, chunk_key):
+        return "{}:{}:{}:{}".format(self.prefix, *chunk_key)
+
+    def get_chunk(self, chunk_key, create=False):
+        """获取区块的索引，区块尚未读取时从附加数据中读取"""
+        chunk = self.chunks.get(chunk_key)
+        if chunk is None:
+            if chunk_key in self.stored:
+                data = self.extra_data_comp.GetExtraData(self.get_data_key(chunk_key))
+                chunk = self.chunks[chunk_key] = set(data) if data else set()
+            elif create:
+                chunk = self.chunks[chunk_key] = set()
+        return chunk
+
+    def load_chunk(self, dimensionId, chunkPosX, chunkPosZ):
+        """区块加载（ChunkLoadedServerEvent）"""
+        self.get_chunk((dimensionId, chunkPosX, chunkPosZ))
+
+    def unload_chunk(self, dimensionId, chunkPosX, chunkPosZ):
+        """区块卸载（ChunkAcquireDiscardedServerEvent），写回修改并释放内存"""
+        chunk_key = dimensionId, chunkPosX, chunkPosZ
+        if chunk_key in self.dirty:
+            self.flush_chunk(chunk_key)
+            self.save_stored()
+        self.chunks.pop(chunk_key, None)
+
+    def add(self, dimensionId, pos):
+        """记录一个玩家放置的木头"""
+        chunk_key, packed = self.locate(dimensionId, pos)
+        chunk = self.get_chunk(chunk_key, create=True)
+        if packed not in chunk:
+            chunk.add(packed)
+            self.dirty.add(chunk_key)
+
+    def discard(self, dimensionId, pos):
+        """木头被移除"""
+        chunk_key, packed = self.locate(dimensionId, pos)
+        chunk = self.get_chunk(chunk_key)
+        if chunk and packed in chunk:
+            chunk.discard(packed)
+            self.dirty.add(chunk_key)
+            self.recently_removed.add((dimensionId,) + tuple(pos))
+
+    def contains(self, dimensionId, pos):
+        """坐标处是否为玩家放置的木头"""
+        chunk_key, packed = self.locate(dimensionId, pos)
+        chunk = self.get_chunk(chunk_key)
+        return chunk is not None and packed in chunk
+
+    def was_placed(self, dimensionId, pos):
+        """坐标处的木头（包括刚被移除的）是否为玩家放置，用于破坏方块事件"""
+        return self.contains(dimensionId, pos) or (dimensionId,) + tuple(pos) in self.recently_removed
+
+    def flush_chunk(self, chunk_key):
+        """将一个区块的索引写入附加数据"""
+        self.dirty.discard(chunk_key)
+        chunk = self.chunks.get(chunk_key)
+        if chunk:
+            self.extra_data_comp.SetExtraData(self.get_data_key(chunk_key), list(chunk), autoSave=True)
+            self.stored.add(chunk_key)
+        elif chunk_key in self.stored:
+            self.extra_data_comp.SetExtraData(self.get_data_key(chunk_key), None, autoSave=True)
+            self.stored.discard(chunk_key)
+
+    def save_stored(self):
+        self.extra_data_comp.SetExtraData(self.prefix, list(list(key) for key in self.stored), autoSave=True)
+
+    def flush(self):
+        """写回所有修改过的区块，并立即保存附加数据（定期调用，关闭存档时也会调用）"""
+        if self.dirty:
+            for chunk_key in list(self.dirty):
+                self.flush_chunk(chunk_key)
+            self.save_stored()
+            self.extra_data_comp.SaveExtraData()
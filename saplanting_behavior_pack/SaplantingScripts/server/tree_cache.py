@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+最近搜索过的木头结构缓存。
+玩家拆木屋、砍伐被上限截断后留下的树桩时，同一个连通结构会被反复完整搜索，而结果每次都是“不是树”。
+这里按(维度, 坐标)记录这些结构，再次破坏其中的木头时直接跳过搜索。
+"""
+import time
+from collections import OrderedDict
+
+# 方块坐标周围（含自身）3x3x3范围的偏移量
+NEIGHBORHOOD = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+# 活塞运动方向（Facing枚举）对应的坐标偏移
+FACING_OFFSETS = {
+    0: (0, -1, 0),  # Down
+    1: (0, 1, 0),  # Up
+    2: (0, 0, -1),  # North
+    3: (0, 0, 1),  # South
+    4: (-1, 0, 0),  # West
+    5: (1, 0, 0),  # East
+}
+
+
+class TreeComponent(object):
+    """
+    一个已完整搜索过、且周围没有天然树叶的木头连通结构。
+
+    只缓存“不是树”的结论：判定为树的结构会立即被砍伐，没有复用价值。
+    只缓存没有木头位于搜索空间边缘的结构（见FellingJob.capped），这样结构中每个木头的所有邻居都已被检查过，
+    从其中任意一个木头出发都会得到同一个结构和同样的结论，因此移除其中的方块不会让结论失效；只有新放置的木头或活塞移动方块才可能改变连通关系。
+    """
+
+    def __init__(self, dimensionId, members, fullName, tree_type, expire):
+        """
+        :param dimensionId: int, 维度ID
+        :param members: set, 结构中的木头坐标
+        :param fullName: str, 木头方块ID
+        :param tree_type: str, 树木类型
+        :param expire: float, 过期时间戳
+        """
+        self.dimensionId = dimensionId
+        self.members = members
+        self.remaining = len(members)  # 尚未被移除的木头数量
+        self.fullName = fullName
+        self.tree_type = tree_type
+        self.expire = expire
+
+
+class TreeStructureCache(object):
+    """
+    TreeComponent的缓存，按最近使用顺序淘汰，并设置过期时间以应对树苗自然生长等没有事件通知的变化。
+    """
+
+    def __init__(self, max_size=128, ttl=300):
+        """
+        :param max_size: int, 最多缓存的结构数
+        :param ttl: int, 结构的有效时间（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.components = OrderedDict()  # type: OrderedDict[int, TreeComponent]
+        self.index = {}  # type: dict[tuple, TreeComponent]
+
+    def __len__(self):
+        return len(self.components)
+
+    def clear(self):
+        """清空缓存，木头列表或树叶检查设置变化时调用"""
+        self.components.clear()
+        self.index.clear()
+
+    def put(self, dimensionId, members, fullName, tree_type):
+        """
+        记录一个判定为“不是树”的结构。
+
+        :param dimensionId: int, 维度ID
+        :param members: iterable, 结构中的木头坐标
+        :param fullName: str, 木头方块ID
+        :param tree_type: str, 树木类型
+        """
+        component = TreeComponent(dimensionId, set(members), fullName, tree_type, time.time() + self.ttl)
+        for pos in component.members:
+            key = (dimensionId,) + pos
+            if key in self.index:
+                self.remove(self.index[key])
+            self.index[key] = component
+        self.components[id(component)] = component
+        while len(self.components) > self.max_size:
+            self.remove(self.components[next(iter(self.components))])
+
+    def remove(self, component):
+        """移除一个结构及其所有索引"""
+        if self.components.pop(id(component), None) is None:
+            return
+        dimensionId = component.dimensionId
+        for pos in component.members:
+            key = (dimensionId,) + pos
+            if self.index.get(key) is component:
+                del self.index[key]
+
+    def lookup(self, dimensionId, pos, fullName, tree_type):
+        """
+        查询坐标所在的结构。
+
+        :return: TreeComponent/None, 坐标属于某个未过期且类型一致的结构时返回该结构
+        """
+        component = self.index.get((dimensionId,) + pos)
+        if component is None:
+            return None
+        if component.expire < time.time():
+            self.remove(component)
+            return None
+        if component.fullName != fullName or component.tree_type != tree_type:
+            return None
+        # 移到末尾，表示最近使用
+        self.components[id(component)] = self.components.pop(id(component))
+        return component
+
+    def on_block_removed(self, dimensionId, pos):
+        """
+        方块被移除（BlockRemoveServerEvent）。
+        结构的结论依然成立，只更新剩余数量，结构中的木头全部被移除后释放该结构。
+        """
+        component = self.index.get((dimensionId,) + pos)
+        if component is not None:
+            component.remaining -= 1
+            if component.remaining <= 0:
+                self.remove(component)
+
+    def invalidate_around(self, dimensionId, pos):
+        """
+        使坐标周围3x3x3范围内包含木头的结构失效。
+        放置木头（EntityPlaceBlockAfterServerEvent）或活塞移动方块（PistonActionServerEvent）时调用。
+        """
+        if not self.index:
+            return
+        x, y, z = pos
+        index = self.index
+        for dx, dy, dz in NEIGHBORHOOD:
+            component = index.get((dimensionId, x + dx, y + dy, z + dz))
+            if component is not None:
+                self.remove(component)
+
+    def on_piston_action(self, dimensionId, facing, blockList, breakBlockList):
+        """
+        活塞推动/缩回方块，被移动方块的原位置和新位置、被破坏方块的位置周围的结构都会失效。
+
+        :param facing: int, 活塞的运动方向，参考Facing枚举
+        :param blockList: list, 被移动的方块坐标
+        :param breakBlockList: list, 被破坏的方块坐标
+        """
+        if not self.index:
+            return
+        offset = FACING_OFFSETS.get(facing, (0, 0, 0))
+        for pos in blockList or ():
+            self.invalidate_around(dimensionId, tuple(pos))
+            self.invalidate_around(dimensionId, (pos[0] + offset[0], pos[1] + offset[1], pos[2] + offset[2]))
+        for pos in breakBlockList or ():
+            self.invalidate_around(dimensionId, tuple(pos))
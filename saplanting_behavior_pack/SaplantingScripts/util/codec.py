@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+客户端与服务端之间配置和树苗消息的紧凑编码。
+
+- 字段名按FIELD_TAGS缩短为一个字母；
+- 物品ID按IDENTIFIERS编码为下标，不在表中的去掉"minecraft:"命名空间；
+- 物品列表展开为一维列表，例如[[物品ID, 附加值], ...]编码为[编码, 附加值, 编码, 附加值, ...]。
+
+编码表由两端共用的代码生成，客户端和服务端必须使用同一版本的模组。
+"""
+from ..config.sapling import default_saplings, special_saplings
+
+NAMESPACE = "minecraft:"
+"""原版物品的命名空间，编码时省略"""
+
+IDENTIFIERS = sorted(set(name for name, _ in default_saplings) | set(name for name, _ in special_saplings))
+"""按下标编码的常用物品ID"""
+IDENTIFIER_INDEX = dict((name, index) for index, name in enumerate(IDENTIFIERS))
+
+FIELD_TAGS = {
+    "playerId": "p",
+    "hash": "h",
+    "min_wait_time": "w",
+    "server_side_detection": "d",
+    "max_ground_checks": "g",
+    "saplings": "s",
+    "saplings_revision": "r",
+    "revision": "v",
+    "add": "a",
+    "remove": "x",
+}
+"""字段名到短标签的映射"""
+TAG_FIELDS = dict((tag, field) for field, tag in FIELD_TAGS.items())
+
+ITEM_LIST_FIELDS = frozenset(("saplings", "add", "remove"))
+"""值为[[物品ID, 附加值], ...]的字段"""
+
+LANDINGS_TAG = "l"
+"""批量落地消息中[(实体ID, 物品ID, 附加值), ...]的短标签"""
+
+
+def encode_identifier(name):
+    """
+    编码物品ID。
+
+    :param name: str, 物品ID
+    :return: int/str, 常用物品ID的下标，或去掉原版命名空间的物品ID
+    """
+    index = IDENTIFIER_INDEX.get(name)
+    if index is not None:
+        return index
+    if name.startswith(NAMESPACE):
+        return name[len(NAMESPACE):]
+    return name
+
+
+def decode_identifier(value):
+    """
+    还原encode_identifier编码的物品ID。
+
+    :param value: int/str, 编码后的物品ID
+    :return: str, 物品ID
+    """
+    if isinstance(value, int):
+        return IDENTIFIERS[value]
+    return value if ":" in value else NAMESPACE + value
+
+
+def encode_items(items):
+    """将[(物品ID, 附加值), ...]编码为一维列表"""
+    encoded = []
+    for name, aux in items:
+        encoded.append(encode_identifier(name))
+        encoded.append(aux)
+    return encoded
+
+
+def decode_items(encoded):
+    """还原encode_items编码的物品列表，每项为[物品ID, 附加值]"""
+    return [[decode_identifier(encoded[i]), encoded[i + 1]] for i in range(0, len(encoded), 2)]
+
+
+def encode_message(data):
+    """
+    编码配置类消息（SyncMasterSetting、SyncSaplingsDelta等）。
+
+    :param data: dict, 原始消息
+    :return: dict, 编码后的消息，不在FIELD_TAGS中的字段保持原样
+    """
+    encoded = {}
+    for key, value in data.items():
+        if key in ITEM_LIST_FIELDS:
+            value = encode_items(value)
+        encoded[FIELD_TAGS.get(key, key)] = value
+    return encoded
+
+
+def decode_message(encoded):
+    """
+    还原encode_message编码的消息。
+
+    :param encoded: dict, 编码后的消息
+    :return: dict, 原始消息
+    """
+    data = {}
+    for tag, value in encoded.items():
+        key = TAG_FIELDS.get(tag, tag)
+        if key in ITEM_LIST_FIELDS:
+            value = decode_items(value)
+        data[key] = value
+    return data
+
+
+def encode_landings(playerId, saplings):
+    """
+    编码批量落地消息（onSaplingsOnGround）。
+
+    :param playerId: str, 发送通知的玩家ID
+    :param saplings: list, [(实体ID, 物品ID, 附加值), ...]
+    :return: dict, 编码后的消息
+    """
+    encoded = []
+    for entityId, name, aux in saplings:
+        encoded.append(entityId)
+        encoded.append(encode_identifier(name))
+        encoded.append(aux)
+    return {FIELD_TAGS["playerId"]: playerId, LANDINGS_TAG: encoded}
+
+
+def decode_landings(encoded):
+    """
+    还原encode_landings编码的消息。
+
+    :param encoded: dict, 编码后的消息
+    :return: tuple, (玩家ID, [(实体ID, 物品ID, 附加值), ...])
+    """
+    values = encoded[LANDINGS_TAG]
+    saplings = [(values[i], decode_identifier(values[i + 1]), values[i + 2]) for i in range(0, len(values), 3)]
+    return encoded[FIELD_TAGS["playerId"]], saplings
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import time
+from collections import OrderedDict
 from copy import deepcopy
 from math import floor
 from random import random
@@ -17,6 +19,164 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+class ExpiringTable(object):
+    """
+    带过期时间的键表，记录最近处理过的键。
+    所有键的有效时间相同，按加入顺序即为过期顺序，清理时只需从表头开始弹出。
+    """
+
+    def __init__(self, ttl):
+        """
+        :param ttl: float, 键的有效时间（秒）
+        """
+        self.ttl = ttl
+        self.entries = OrderedDict()  # type: OrderedDict[object, float]
+
+    def __len__(self):
+        self.purge()
+        return len(self.entries)
+
+    def __contains__(self, key):
+        expire = self.entries.get(key)
+        return expire is not None and expire >= time.time()
+
+    def add(self, key):
+        """
+        记录一个键。
+
+        :return: bool, 键不在表中（或已过期）时返回True，已存在时返回False且不刷新其过期时间
+        """
+        now = time.time()
+        self.purge(now)
+        if key in self.entries:
+            return False
+        self.entries[key] = now + self.ttl
+        return True
+
+    def discard(self, key):
+        """提前移除一个键"""
+        self.entries.pop(key, None)
+
+    def purge(self, now=None):
+        """移除所有已过期的键"""
+        if now is None:
+            now = time.time()
+        entries = self.entries
+        while entries:
+            key = next(iter(entries))
+            if entries[key] >= now:
+                break
+            del entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+
+class LRUCache(object):
+    """
+    容量有限的缓存，超过容量时淘汰最久未使用的项。
+    """
+
+    def __init__(self, max_size=256):
+        """
+        :param max_size: int, 最多缓存的项数
+        """
+        self.max_size = max_size
+        self.data = OrderedDict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        """
+        查询缓存，命中时将该项移到末尾，表示最近使用。
+        """
+        data = self.data
+        if key in data:
+            value = data.pop(key)
+            data[key] = value
+            return value
+        return default
+
+    def put(self, key, value):
+        data = self.data
+        data.pop(key, None)
+        data[key] = value
+        if len(data) > self.max_size:
+            data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+
+class TimerWheel(object):
+    """
+    哈希时间轮，用一个定时入口管理大量按tick到期的键。
+    到期tick对槽数取模决定所在的槽，超过一圈的键记录剩余圈数，每转到该槽时减一。
+    """
+
+    def __init__(self, size=256):
+        """
+        :param size: int, 槽数
+        """
+        self.size = size
+        self.slots = [{} for _ in range(size)]  # type: list[dict[object, int]]
+        self.slot_of = {}  # type: dict[object, int]
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __contains__(self, key):
+        return key in self.slot_of
+
+    def schedule(self, key, ticks):
+        """
+        在ticks个tick后到期，已存在的键会被重新安排。
+
+        :param key: 键
+        :param ticks: int, 延迟的tick数，至少为1
+        """
+        self.discard(key)
+        ticks = max(1, int(ticks))
+        slot = (self.cursor + ticks) % self.size
+        self.slots[slot][key] = (ticks - 1) // self.size
+        self.slot_of[key] = slot
+
+    def discard(self, key):
+        """取消一个键"""
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self):
+        """
+        前进一个tick。
+
+        :return: list, 本tick到期的键
+        """
+        self.cursor = cursor = (self.cursor + 1) % self.size
+        slot = self.slots[cursor]
+        if not slot:
+            return []
+        due = []
+        for key, rounds in slot.items():
+            if rounds:
+                slot[key] = rounds - 1
+            else:
+                due.append(key)
+        slot_of = self.slot_of
+        for key in due:
+            del slot[key]
+            del slot_of[key]
+        return due
+
+    def clear(self):
+        for slot in self.slots:
+            slot.clear()
+        self.slot_of.clear()
+
+
 def dealunicode(_instance):
     """
     递归处理数据结构中的unicode字符串，将其编码为utf-8。
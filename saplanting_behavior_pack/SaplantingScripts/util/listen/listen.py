@@ -19,13 +19,13 @@ class Listen:
         一个可调用字符串的内部类，这是实现 @Listen.server 这种语法的关键。
         它继承自str，但重写了__call__方法，使得类的实例（如'server'）可以像函数一样被调用。
         """
-        def __call__(self, event_class, priority=0):
+        def __call__(self, event_class, priority=0, lazy=False):
             """
             当实例被调用时，例如 @Listen.server("SomeEvent")，此方法会被执行。
             它实际上是一个快捷方式，最终会调用Listen.on这个主装饰器，
             并把实例自身（如'server'）作为事件类型（_type）传递过去。
             """
-            return Listen.on(event_class, _type=self, priority=priority)
+            return Listen.on(event_class, _type=self, priority=priority, lazy=lazy)
 
     # 创建CallableStr的实例，这样我们就可以使用 @Listen.server, @Listen.client 等语法
     server = CallableStr('server')
@@ -34,7 +34,7 @@ class Listen:
     client = CallableStr('client')
 
     @staticmethod
-    def on(event_class, _type="minecraft", priority=0):
+    def on(event_class, _type="minecraft", priority=0, lazy=False):
         """
         核心的事件监听装饰器工厂。
         它接收事件信息，并返回一个真正的装饰器。
@@ -42,6 +42,7 @@ class Listen:
         :param event_class: str或BaseEvent子类, 要监听的事件名称或事件类
         :param _type: str, 事件类型, 如 "minecraft", "server", "client"
         :param priority: int, 监听器的优先级
+        :param lazy: bool, 为True时不自动注册，由System调用listen_method按需注册
         """
         # 解析出事件的字符串名称
         if isinstance(event_class, basestring):
@@ -61,6 +62,7 @@ class Listen:
             func.listen_type = _type
             func.listen_event = event_name
             func.listen_priority = priority
+            func.listen_lazy = lazy
             return func
 
         return decorator
@@ -9,6 +9,43 @@ from mod.common.minecraftEnum import ItemPosType
 
 compFactory = serverApi.GetEngineCompFactory()
 itemComp = compFactory.CreateItem(serverApi.GetLevelId())
+blockStateComp = compFactory.CreateBlockState(serverApi.GetLevelId())
+
+# 按(组件类型, 所属实体ID)缓存的引擎组件，实体移除或玩家离开时通过ReleaseComponents释放
+componentPool = {}
+componentOwners = {}
+componentPoolStats = {"created": 0, "reused": 0}
+
+
+def GetComponent(kind, ownerId):
+    """
+    从组件池获取组件，不存在时创建。
+    :param kind: str, 组件类型，即compFactory.Create之后的部分，例如"Item"、"Pos"
+    :param ownerId: str, 组件所属的实体ID
+    :return: 引擎组件
+    """
+    key = (kind, ownerId)
+    comp = componentPool.get(key)
+    if comp is None:
+        comp = getattr(compFactory, "Create" + kind)(ownerId)
+        componentPool[key] = comp
+        componentOwners.setdefault(ownerId, set()).add(kind)
+        componentPoolStats["created"] += 1
+    else:
+        componentPoolStats["reused"] += 1
+    return comp
+
+
+def ReleaseComponents(ownerId):
+    """
+    释放一个实体的所有池化组件。
+    :param ownerId: str, 实体ID
+    """
+    kinds = componentOwners.pop(ownerId, None)
+    if kinds:
+        for kind in kinds:
+            componentPool.pop((kind, ownerId), None)
+
 
 # 缓存物品信息，避免重复调用API
 cachedItemInfos = {}
@@ -48,6 +85,43 @@ def isAxe(itemName, auxValue=0):
     axe_items_cache[itemName] = False
     return False
 
+def GetToolTier(itemName, auxValue=0):
+    """
+    获取工具物品的等级（tierLevel），非工具物品为0。
+    """
+    info = GetItemInfo(itemName, auxValue)
+    if info:
+        return info.get("tierLevel", 0) or 0
+    return 0
+
+# 缓存木头方块对应的掉落物
+cachedLogDrops = {}
+
+
+def GetLogDropItem(blockName, auxValue):
+    """
+    获取木头方块被破坏后掉落的物品。
+    掉落物与方块ID相同，但不保留朝向（pillar_axis），例如横放的白桦木掉落普通的白桦木。
+    :param blockName: str, 方块ID
+    :param auxValue: int, 方块附加值
+    :return: tuple, (物品ID, 物品附加值)
+    """
+    key = (blockName, auxValue)
+    if key in cachedLogDrops:
+        return cachedLogDrops[key]
+    itemAux = 0
+    states = blockStateComp.GetBlockStatesFromAuxValue(blockName, auxValue)
+    if states:
+        if "pillar_axis" in states:
+            states = dict(states)
+            states["pillar_axis"] = "y"
+        aux = blockStateComp.GetBlockAuxValueFromStates(blockName, states)
+        if aux is not None and aux >= 0:
+            itemAux = aux
+    cachedLogDrops[key] = blockName, itemAux
+    return cachedLogDrops[key]
+
+
 def is_same_itme_ignore_count(old, new):
     """
     比较两个物品字典，判断它们是否为同一种物品（忽略数量）。
@@ -80,7 +154,7 @@ def AddItemToPlayerInventory(playerId, spawnitem):
     else:
         maxStackSize = 1
 
-    itemcomp = compFactory.CreateItem(playerId)
+    itemcomp = GetComponent("Item", playerId)
     playerInv = itemcomp.GetPlayerAllItems(ItemPosType.INVENTORY, True)
 
     # 优先尝试堆叠到已有物品或空槽位
@@ -102,16 +176,38 @@ def AddItemToPlayerInventory(playerId, spawnitem):
         else:
             return True
     # 如果背包已满，则在玩家位置生成掉落物
+    if count > 0:
+        itemDict = deepcopy(spawnitem)
+        itemDict['count'] = count
+        dim = GetComponent("Dimension", playerId).GetEntityDimensionId()
+        pos = GetComponent("Pos", playerId).GetPos()
+        pos = (pos[0], pos[1] - 1, pos[2])
+        SpawnItemStacksToLevel(itemDict, dim, pos, maxStackSize)
+    return True
+
+
+def SpawnItemStacksToLevel(spawnitem, dimensionId, pos, maxStackSize=None):
+    """
+    在世界中生成掉落物，数量超过最大堆叠数时按整组拆分，生成尽可能少的物品实体。
+    :param spawnitem: dict, 物品字典，数量(count)可以超过最大堆叠数
+    :param dimensionId: int, 维度ID
+    :param pos: tuple, 生成位置
+    :param maxStackSize: int, 最大堆叠数，为None时自动获取
+    :return: int, 生成的物品实体数量
+    """
+    count = spawnitem['count'] if 'count' in spawnitem else 0
+    if maxStackSize is None:
+        info = itemComp.GetItemBasicInfo(spawnitem["newItemName"], spawnitem["newAuxValue"])
+        maxStackSize = info['maxStackSize'] if info else 1
+    spawned = 0
     while count > 0:
         spawncount = min(maxStackSize, count)
         itemDict = deepcopy(spawnitem)
         itemDict['count'] = spawncount
-        dim = compFactory.CreateDimension(playerId).GetEntityDimensionId()
-        pos = compFactory.CreatePos(playerId).GetPos()
-        pos = (pos[0], pos[1] - 1, pos[2])
-        itemComp.SpawnItemToLevel(itemDict, dim, pos)
+        itemComp.SpawnItemToLevel(itemDict, dimensionId, pos)
         count -= spawncount
-    return True
+        spawned += 1
+    return spawned
 
 
 def AddItemToContainer(chestpos, spawnitem, dimension=0):